@@ -0,0 +1,283 @@
+"""Fleet benchmark for InControl2 discovery and polling against a local mock API.
+
+Starts an aiohttp stand-in for api.ic.peplink.com/rest/ with a configurable
+fleet size, latency, error rate and payload sizes, then measures discovery
+(InControl2Org.find_orgs), poll cycles (InControl2Device.update_all) and, when
+Home Assistant is installed, entity creation by the platform setup functions.
+With --reloads, the connection is also set up and torn down repeatedly like a
+config entry reload, to check that memory, tasks and request counts stay flat.
+
+Usage (from the repository root, with requirements_dev.txt installed):
+
+    python -m benchmarks.bench_fleet [--groups 4] [--devices 50] [--latency 0.05] [--json out.json]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import random
+import time
+import tracemalloc
+import weakref
+from collections import Counter
+from types import SimpleNamespace
+
+from aiohttp import web
+
+from custom_components.incontrol2.incontrol2 import (
+    InControl2Connection,
+    InControl2Device,
+    InControl2OAuth,
+    InControl2Org,
+    endpoint_template,
+)
+
+
+class MockInControl2(object):
+    """Serves a synthetic fleet under /rest/ and counts requests per endpoint."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.requests = Counter()
+        self.bytes_sent = 0
+        self._loc_cursor = Counter()
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_get('/rest/o', self.orgs)
+        app.router.add_get('/rest/o/{org}/g', self.groups)
+        app.router.add_get('/rest/o/{org}/g/{group}/d', self.devices)
+        app.router.add_get('/rest/o/{org}/g/{group}/d/{device}', self.device)
+        app.router.add_get('/rest/o/{org}/g/{group}/d/{device}/loc', self.location)
+        app.router.add_get('/rest/o/{org}/g/{group}/d/{device}/info/interfaces', self.interfaces)
+        return app
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        self.requests[endpoint_template(request.path[len('/rest/'):])] += 1
+        if self.args.latency:
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.args.latency)
+        if self.rng.random() < self.args.error_rate:
+            return web.json_response({'stat': 'error'}, status=500)
+
+        response = await handler(request)
+        self.bytes_sent += len(response.body)
+        return response
+
+    @staticmethod
+    def reply(data) -> web.Response:
+        return web.json_response({'stat': 'ok', 'data': data})
+
+    async def orgs(self, _request: web.Request) -> web.Response:
+        return self.reply([{'id': f'org{org}', 'name': f'Org {org}', 'status': 'active'}
+                           for org in range(self.args.orgs)])
+
+    async def groups(self, _request: web.Request) -> web.Response:
+        return self.reply([{'id': group, 'name': f'Group {group}'} for group in range(self.args.groups)])
+
+    def device_record(self, group: int, device: int) -> dict:
+        device_id = group * 100000 + device
+        online = random.Random(device_id).random() >= self.args.offline_rate
+        # Like on real routers, the uptime of online devices changes between polls
+        uptime = 86400 + sum(self.requests.values()) if online else 0
+        record = {'id': device_id, 'name': f'Router {device_id}', 'status': 'online' if online else 'offline',
+                  'sn': f'1111-2222-{device_id:04d}', 'product_name': 'MAX BR1 Pro 5G', 'product_code': 'MAX-BR1',
+                  'fw_ver': '8.4.0', 'client_count': device % 7, 'uptime': uptime, 'last_online': '2024-01-01',
+                  'note': 'x' * self.args.padding}
+        if self.args.embed_interfaces:
+            record['interfaces'] = self.interface_records(device_id)
+        return record
+
+    def interface_records(self, device_id: int) -> list:
+        return [{'id': wan, 'name': f'Cellular {wan}', 'type': 'gobi', 'virtualType': 'cellular',
+                 'status': 'Connected', 'status_led': 'green', 'message': 'Connected', 'is_enable': 1,
+                 'ip': f'10.{device_id % 250}.{wan}.2', 'signal': -80, 'signal_bar': 3, 'note': 'x' * self.args.padding}
+                for wan in range(1, self.args.wans + 1)]
+
+    async def devices(self, request: web.Request) -> web.Response:
+        group = int(request.match_info['group'])
+        return self.reply([self.device_record(group, device) for device in range(self.args.devices)])
+
+    async def device(self, request: web.Request) -> web.Response:
+        device_id = int(request.match_info['device'])
+        return self.reply(self.device_record(device_id // 100000, device_id % 100000))
+
+    async def location(self, request: web.Request) -> web.Response:
+        # Every request reveals loc_points more fixes; 'start' is inclusive like the real API
+        device_id = request.match_info['device']
+        self._loc_cursor[device_id] += self.args.loc_points
+        end = self._loc_cursor[device_id]
+        start = max(int(request.query.get('start', 0)), end - self.args.loc_points)
+        return self.reply([{'la': 45.0 + index * 1e-4, 'lo': -122.0, 'at': 10, 'sp': 30, 'ts': f'{index:012d}'}
+                           for index in range(start, end)])
+
+    async def interfaces(self, request: web.Request) -> web.Response:
+        return self.reply(self.interface_records(int(request.match_info['device'])))
+
+
+async def run(args: argparse.Namespace) -> dict:
+    mock = MockInControl2(args)
+    runner = web.AppRunner(mock.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    connection = connect(args, port)
+    connection.tracer.sample_rate = 1 if args.trace else 0
+
+    results = {'fleet': {'orgs': args.orgs, 'groups': args.orgs * args.groups,
+                         'devices': args.orgs * args.groups * args.devices, 'wans': args.wans}}
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        await InControl2Org.find_orgs(connection)
+        results['discovery'] = {'seconds': round(time.perf_counter() - started, 3),
+                                'requests': sum(mock.requests.values()),
+                                'devices': len(InControl2Device.get_devices(connection))}
+
+        cycles = []
+        for _ in range(args.cycles):
+            # Every device is due in every cycle
+            for device in InControl2Device.get_devices(connection):
+                device.schedule_next_poll(0)
+            mock.requests.clear()
+            started = time.perf_counter()
+            connection.tracer.start_cycle()
+            summary = await InControl2Device.update_all(connection, args.concurrency, args.device_timeout,
+                                                        scan_interval=0)
+            connection.tracer.end_cycle()
+            cycles.append({'seconds': round(time.perf_counter() - started, 3),
+                           'requests': sum(mock.requests.values()),
+                           'by_endpoint': dict(mock.requests),
+                           'failed': sum(1 for result in summary.values() if result != 'ok')})
+        results['poll_cycles'] = cycles
+
+        results['entities'] = await platform_entities(connection)
+        if args.trace:
+            connection.tracer.export(args.trace)
+        results['reloads'] = await reloads(args, port, mock)
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        await connection.close()
+        await runner.cleanup()
+
+    results['peak_memory_kib'] = round(peak / 1024, 1)
+    results['bytes_sent'] = mock.bytes_sent
+    results['client'] = {'cache': connection.cache.stats, 'pool': connection.pool_stats,
+                         'retries': connection.retry_policy.stats, 'rate_limiter': connection.rate_limiter.stats,
+                         'endpoints': connection.metrics.stats}
+    return results
+
+
+def connect(args: argparse.Namespace, port: int) -> InControl2Connection:
+    oauth = InControl2OAuth('client', 'secret', 'http://localhost/', None, None)
+    token_info = {'access_token': 'token', 'refresh_token': 'refresh', 'expires_in': 86400 * 365,
+                  'expires_at': int(time.time()) + 86400 * 365}
+    connection = InControl2Connection(oauth, token_info, concurrency=args.concurrency,
+                                      streaming=args.streaming, api_endpoint=f'http://127.0.0.1:{port}/rest/')
+    connection.rate_limiter.configure(args.rate_limit)
+    return connection
+
+
+async def reloads(args: argparse.Namespace, port: int, mock: MockInControl2) -> list:
+    """Discover, poll once and tear down a fresh connection per reload, like unloading the config entry."""
+    results = []
+    for _ in range(args.reloads):
+        mock.requests.clear()
+        connection = connect(args, port)
+        await InControl2Org.find_orgs(connection)
+        await InControl2Device.update_all(connection, args.concurrency, args.device_timeout, scan_interval=0)
+        await connection.close()
+        connection.clear()
+
+        released = weakref.ref(connection)
+        del connection
+        gc.collect()
+        results.append({'requests': sum(mock.requests.values()),
+                        'memory_kib': round(tracemalloc.get_traced_memory()[0] / 1024, 1),
+                        'tasks': len(asyncio.all_tasks()),
+                        'released': released() is None})
+
+    return results
+
+
+async def platform_entities(connection: InControl2Connection) -> dict:
+    """Time the platform setup functions on the discovered devices, if Home Assistant is installed."""
+    try:
+        from custom_components.incontrol2 import binary_sensor, device_tracker, sensor
+    except ImportError as err:
+        return {'skipped': f'Home Assistant is not installed ({err.name})'}
+
+    coordinator = SimpleNamespace(full_attributes=False, connection=connection)
+    hass = SimpleNamespace(data={})
+    entry = SimpleNamespace(entry_id='bench', runtime_data=coordinator, async_on_unload=lambda _: None)
+    entities = []
+
+    started = time.perf_counter()
+    for platform in (binary_sensor, sensor, device_tracker):
+        await platform.async_setup_entry(hass, entry, entities.extend)
+    seconds = time.perf_counter() - started
+
+    return {'count': len(entities), 'seconds': round(seconds, 4),
+            'per_second': round(len(entities) / seconds) if seconds else None}
+
+
+def report(results: dict) -> None:
+    fleet = results['fleet']
+    print(f"fleet: {fleet['orgs']} orgs, {fleet['groups']} groups, {fleet['devices']} devices, "
+          f"{fleet['wans']} WANs each")
+    discovery = results['discovery']
+    print(f"  discovery       {discovery['seconds']:8.3f} s {discovery['requests']:6d} requests "
+          f"{discovery['devices']:6d} devices")
+    for index, cycle in enumerate(results['poll_cycles'], 1):
+        print(f"  poll cycle {index:<4} {cycle['seconds']:8.3f} s {cycle['requests']:6d} requests "
+              f"{cycle['failed']:6d} failed")
+    entities = results['entities']
+    if 'skipped' in entities:
+        print(f"  entities        skipped: {entities['skipped']}")
+    else:
+        print(f"  entities        {entities['count']:8d} in {entities['seconds']} s ({entities['per_second']}/s)")
+    for template, stats in results['client']['endpoints'].items():
+        print(f"  {template:<30} {stats['requests']:6d} requests {stats['latency_mean'] or 0:8.4f} s mean "
+              f"{stats['latency_max']:8.4f} s max {stats['retries']:4d} retries {stats['timeouts']:4d} timeouts")
+    for index, reload in enumerate(results['reloads'], 1):
+        print(f"  reload {index:<8} {reload['memory_kib']:8.1f} KiB {reload['requests']:6d} requests "
+              f"{reload['tasks']:6d} tasks {'released' if reload['released'] else 'LEAKED'}")
+    print(f"  peak memory     {results['peak_memory_kib']:8.1f} KiB")
+    print(f"  bytes served    {results['bytes_sent'] / 1024:8.1f} KiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orgs', type=int, default=1)
+    parser.add_argument('--groups', type=int, default=4, help='groups per org')
+    parser.add_argument('--devices', type=int, default=50, help='devices per group')
+    parser.add_argument('--wans', type=int, default=3, help='WAN interfaces per device')
+    parser.add_argument('--loc-points', type=int, default=20, help='new location fixes per /loc request')
+    parser.add_argument('--padding', type=int, default=0, help='extra bytes per device and interface record')
+    parser.add_argument('--embed-interfaces', action='store_true', help='include interfaces in device listings')
+    parser.add_argument('--offline-rate', type=float, default=0.1)
+    parser.add_argument('--latency', type=float, default=0.05, help='mean seconds per request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with a 500')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--device-timeout', type=int, default=60)
+    parser.add_argument('--rate-limit', type=float, default=1000, help='client requests per second')
+    parser.add_argument('--streaming', action='store_true', help='use the streaming parsers')
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--reloads', type=int, default=0, help='set up and tear down the connection this many times')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--trace', help='write the slowest poll cycle to this Chrome trace file')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report(results)
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
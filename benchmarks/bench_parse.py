@@ -0,0 +1,83 @@
+"""Microbenchmark for InControl2 response parsing.
+
+Compares the old text-then-parse path with parsing straight from bytes and
+with the streaming parsers, on recorded (or synthetic) /loc and
+/info/interfaces payloads.
+
+Usage (from the repository root, with requirements_dev.txt installed):
+
+    python -m benchmarks.bench_parse [--loc loc.json] [--interfaces interfaces.json]
+"""
+import argparse
+import json
+import random
+import timeit
+import tracemalloc
+from pathlib import Path
+
+from custom_components.incontrol2.incontrol2 import (
+    LOCATION_HISTORY_SIZE,
+    WAN_FIELDS,
+    parse_array_fields,
+    parse_array_tail,
+    parse_json,
+)
+
+
+def synthetic_locations(points: int = 2880) -> bytes:
+    """A day of fixes at 30 second intervals."""
+    rng = random.Random(1)
+    data = [{'la': 45.0 + rng.random(), 'lo': -122.0 + rng.random(), 'at': rng.randint(0, 300),
+             'sp': rng.randint(0, 120), 'ts': f'2024-01-01T{i // 120:02d}:{i // 2 % 60:02d}:{i % 2 * 30:02d}'}
+            for i in range(points)]
+    return json.dumps({'stat': 'ok', 'data': data}).encode()
+
+
+def synthetic_interfaces(wans: int = 12) -> bytes:
+    """A multi-modem router with verbose per-interface details."""
+    rng = random.Random(2)
+    data = [{'id': i, 'name': f'Cellular {i}', 'type': 'gobi', 'virtualType': 'cellular',
+             'status': 'Connected', 'status_led': 'green', 'message': 'Connected', 'is_enable': 1,
+             'ip': f'10.0.{i}.2', 'signal': rng.randint(-110, -60), 'signal_bar': rng.randint(0, 5),
+             'cellular': {'carrier': {'name': 'Carrier'}, 'rat': [{'name': 'LTE', 'band': [
+                 {'name': f'B{b}', 'signal': {'rssi': -70, 'sinr': 10, 'rsrp': -100, 'rsrq': -10}}
+                 for b in range(8)]}]},
+             'sims': [{'id': s, 'imsi': '0' * 15, 'iccid': '0' * 20, 'apn': 'internet'} for s in range(2)]}
+            for i in range(wans)]
+    return json.dumps({'stat': 'ok', 'data': data}).encode()
+
+
+def measure(name: str, func, body: bytes, number: int) -> None:
+    seconds = min(timeit.repeat(lambda: func(body), number=number, repeat=5)) / number
+    tracemalloc.start()
+    func(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'  {name:<24} {seconds * 1e6:10.1f} us/op {peak / 1024:10.1f} KiB peak')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--loc', help='recorded /loc response body')
+    parser.add_argument('--interfaces', help='recorded /info/interfaces response body')
+    parser.add_argument('--number', type=int, default=50)
+    args = parser.parse_args()
+
+    payloads = {
+        'loc': Path(args.loc).read_bytes() if args.loc else synthetic_locations(),
+        'interfaces': Path(args.interfaces).read_bytes() if args.interfaces else synthetic_interfaces(),
+    }
+    streaming = {
+        'loc': parse_array_tail(LOCATION_HISTORY_SIZE),
+        'interfaces': parse_array_fields(WAN_FIELDS),
+    }
+
+    for name, body in payloads.items():
+        print(f'{name}: {len(body) / 1024:.1f} KiB')
+        measure('text + json.loads', lambda b: json.loads(b.decode('utf-8')), body, args.number)
+        measure('parse_json (bytes)', parse_json, body, args.number)
+        measure('streaming', streaming[name], body, args.number)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,50 +2,72 @@
 import logging
 from datetime import timedelta
 
+import voluptuous as vol
+
 from . import incontrol2
 
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
 from homeassistant.core import HomeAssistant
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.helpers.storage import Store
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.config_entries import ConfigEntryAuthFailed
 
 from . import config_flow
+from .coordinator import InControl2Coordinator
 from .const import (
-    DATA_INCONTROL2,
     CONF_CLIENT_ID,
     CONF_CLIENT_SECRET,
-    CONF_SCAN_INTERVAL,
+    CONF_CONCURRENCY,
+    CONF_STREAMING_PARSE,
     DOMAIN,
+    SIGNAL_NEW_DEVICES,
+    SIGNAL_NEW_WANS,
+    SNAPSHOT_STORAGE_KEY,
+    SNAPSHOT_STORAGE_VERSION,
     STORAGE_KEY,
     STORAGE_VERSION,
+    TRACE_FILENAME,
 )
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(minutes=10)
+PLATFORMS = ["binary_sensor", "sensor", "device_tracker"]
 
 
 async def async_setup(hass: HomeAssistant, *_) -> bool:
     """Set up InControl2 components."""
 
-    async def update_service(*_) -> None:
-        await update_devices()
-
-    async def update_devices(*_) -> None:
-        _LOGGER.debug("Scheduled update of all devices")
-        incontrol2device = hass.data.get(DATA_INCONTROL2)
-
-        if incontrol2device is None:
-            return
+    def loaded_entries() -> list:
+        return [entry for entry in hass.config_entries.async_entries(DOMAIN)
+                if entry.state is ConfigEntryState.LOADED]
 
-        await incontrol2device.update_all()
+    async def update_service(*_) -> None:
+        for entry in loaded_entries():
+            # Adaptive polling leaves stable and offline devices out of most refreshes
+            incontrol2.InControl2Device.schedule_all_now(entry.runtime_data.connection)
+            await entry.runtime_data.async_request_refresh()
+
+    async def discover_service(*_) -> None:
+        for entry in loaded_entries():
+            await async_discover_devices(hass, entry, entry.runtime_data)
+
+    async def export_trace_service(call) -> None:
+        cycle = call.data.get('cycle', 'slowest')
+        for entry in loaded_entries():
+            path = hass.config.path(TRACE_FILENAME.format(entry.entry_id))
+            if await hass.async_add_executor_job(entry.runtime_data.connection.tracer.export, path, cycle):
+                _LOGGER.info(f"Wrote the {cycle} traced poll cycle of {entry.title} to {path}")
+            else:
+                _LOGGER.warning(f"No traced poll cycle of {entry.title} to export, is trace_sample_rate set?")
 
     hass.services.async_register(DOMAIN, 'update_all', update_service)
-    # TODO: Add service for checking for new devices
+    hass.services.async_register(DOMAIN, 'discover_devices', discover_service)
+    hass.services.async_register(DOMAIN, 'export_trace', export_trace_service,
+                                 schema=vol.Schema({vol.Optional('cycle'): vol.In(['last', 'slowest'])}))
 
-    async_track_time_interval(hass, update_devices, SCAN_INTERVAL)
-    # TODO: Check for new devices occasionally
     return True
 
 
@@ -54,9 +76,17 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     config = entry.data
     websession = async_get_clientsession(hass)
-    store = Store(hass=hass, key=STORAGE_KEY, version=STORAGE_VERSION)
+    store = config_flow.token_store(hass, config[CONF_CLIENT_ID])
     token_info = await store.async_load()
 
+    if token_info is None:
+        # Tokens of a single account used to be stored under one key for the whole integration
+        legacy_store = Store(hass=hass, key=STORAGE_KEY, version=STORAGE_VERSION)
+        token_info = await legacy_store.async_load()
+        if token_info is not None:
+            await store.async_save(token_info)
+            await legacy_store.async_remove()
+
     oauth = incontrol2.InControl2OAuth(
         config[CONF_CLIENT_ID],
         config[CONF_CLIENT_SECRET],
@@ -72,16 +102,151 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         token_info = None
         raise ConfigEntryAuthFailed(err) from err
 
+    # The data connection owns a pooled session sized to the polling concurrency
     data_connection = incontrol2.InControl2Connection(
-        oauth, token_info=token_info, websession=websession
+        oauth, token_info=token_info,
+        concurrency=entry.options.get(CONF_CONCURRENCY, incontrol2.DEFAULT_CONCURRENCY),
+        streaming=entry.options.get(CONF_STREAMING_PARSE, False),
     )
 
-    if not await incontrol2.InControl2Org.find_orgs(data_connection):
+    async def close_connection(*_) -> None:
+        await data_connection.close()
+
+    entry.async_on_unload(hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, close_connection))
+
+    # Entities are created from the last snapshot right away; live discovery then runs in the background
+    snapshot_store = Store(hass=hass, key=f"{SNAPSHOT_STORAGE_KEY}.{entry.entry_id}",
+                           version=SNAPSHOT_STORAGE_VERSION)
+    snapshot = await snapshot_store.async_load()
+    restored = bool(snapshot) and incontrol2.InControl2Org.restore_all(snapshot, data_connection)
+
+    try:
+        found = restored or await incontrol2.InControl2Org.find_orgs(data_connection)
+    except BaseException:
+        await data_connection.close()
+        raise
+
+    if not found:
         _LOGGER.error("No orgs found")
+        await data_connection.close()
         return False
 
-    hass.data[DATA_INCONTROL2] = incontrol2.InControl2Device
+    # Discovery or the snapshot already provided every device, so the first scheduled refresh is enough
+    coordinator = InControl2Coordinator(hass, data_connection, entry.options, snapshot_store)
+    entry.runtime_data = coordinator
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
+
+    # Entities for the current devices and WANs are created by the platform setup below
+    for device in incontrol2.InControl2Device.get_devices(data_connection):
+        device.wan_changes()
+
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    await hass.config_entries.async_forward_entry_setups(entry, ["binary_sensor", "sensor", "device_tracker"])
+    async def discover(*_) -> None:
+        await async_discover_devices(hass, entry, coordinator)
 
+    entry.async_on_unload(async_track_time_interval(hass, discover, timedelta(seconds=incontrol2.DISCOVERY_INTERVAL),
+                                                    name="incontrol2_discovery", cancel_on_shutdown=True))
+
+    if restored:
+        entry.async_create_background_task(hass, async_discover_devices(hass, entry, coordinator),
+                                           "incontrol2_discovery")
+    else:
+        coordinator.async_save_snapshot()
+
+    return True
+
+
+async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Unload a config entry.
+
+    Timers, listeners and background tasks registered on the entry are cancelled
+    by Home Assistant after this returns; the coordinator stops polling, closes
+    the connection and drops the devices and their entities.
+    """
+    if not await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        return False
+
+    await entry.runtime_data.async_shutdown()
     return True
+
+
+async def async_discover_devices(hass: HomeAssistant, entry: ConfigEntry, coordinator: InControl2Coordinator) -> None:
+    """Run a live discovery and reconcile the entities with the devices and WANs found."""
+    if coordinator.discovery_lock.locked():
+        _LOGGER.debug("Device discovery already running")
+        return
+
+    async with coordinator.discovery_lock:
+        await _async_discover_devices(hass, entry, coordinator)
+
+
+async def _async_discover_devices(hass: HomeAssistant, entry: ConfigEntry,
+                                  coordinator: InControl2Coordinator) -> None:
+    try:
+        found = await incontrol2.InControl2Org.find_orgs(coordinator.connection)
+    except ConfigEntryAuthFailed:
+        entry.async_start_reauth(hass)
+        return
+    except (incontrol2.InControl2Timeout, incontrol2.InControl2ClientError, incontrol2.InControl2UnknownError) as err:
+        _LOGGER.warning(f"Device discovery failed: {err}")
+        return
+
+    if not found:
+        _LOGGER.warning("Device discovery found no orgs")
+        return
+
+    connection = coordinator.connection
+    changes = connection.discovery_changes
+    for device in changes['added']:
+        device.wan_changes()
+    if changes['added']:
+        async_dispatcher_send(hass, SIGNAL_NEW_DEVICES.format(entry.entry_id), changes['added'])
+
+    # Removing the registry entries also removes the entities from Home Assistant
+    registry = er.async_get(hass)
+
+    def remove_entities(device: incontrol2.InControl2Device, predicate) -> None:
+        for entity in [entity for entity in device.entities if predicate(entity)]:
+            device.remove_entity(entity)
+            if entity.entity_id and registry.async_get(entity.entity_id) is not None:
+                registry.async_remove(entity.entity_id)
+
+    device_registry = dr.async_get(hass)
+    for device in changes['removed']:
+        remove_entities(device, lambda entity: True)
+        # Also drops the router from the device registry unless another entry still provides it
+        identifier = f'{device.org_id}_{device.group_id}_{device.device_id}'
+        device_entry = device_registry.async_get_device(identifiers={(DOMAIN, identifier)})
+        if device_entry is not None:
+            device_registry.async_update_device(device_entry.id, remove_config_entry_id=entry.entry_id)
+
+    topology_changed = bool(changes['added'] or changes['removed'])
+    for device in incontrol2.InControl2Device.get_devices(connection):
+        added_wans, removed_wans = device.wan_changes()
+        if added_wans:
+            async_dispatcher_send(hass, SIGNAL_NEW_WANS.format(entry.entry_id), device, added_wans)
+        if removed_wans:
+            remove_entities(device, lambda entity: getattr(entity, 'wan_id', None) in removed_wans)
+        topology_changed = topology_changed or bool(added_wans or removed_wans)
+
+    _LOGGER.debug(f"Device discovery finished: {connection.discovery_stats}")
+
+    # The entry may have been unloaded meanwhile
+    if connection.closed:
+        return
+
+    if topology_changed:
+        coordinator.async_save_snapshot()
+
+    # Entities write the status changes the discovery refreshed, e.g. of devices restored from the snapshot
+    coordinator.async_update_listeners()
+
+    # Devices the discovery did not refresh may still be due
+    if incontrol2.InControl2Device.has_due_devices(connection):
+        await coordinator.async_request_refresh()
+
+
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply updated options to the running coordinator."""
+    await entry.runtime_data.async_apply_options(entry.options)
@@ -3,53 +3,70 @@
 import logging
 from typing import Callable
 
-from .incontrol2 import InControl2Device
-from homeassistant.core import HomeAssistant
+from .incontrol2 import CHANGED_CIRCUITS, CHANGED_DATA, CHANGED_STATUS, InControl2Device
+from .coordinator import InControl2Coordinator
+from .entity import InControl2Entity
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.components.binary_sensor import BinarySensorEntity, BinarySensorDeviceClass
 
 from .const import (
     DOMAIN,
     PEPLINK,
+    SIGNAL_NEW_DEVICES,
+    SIGNAL_NEW_WANS,
     IncontrolIcons
 )
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def async_setup_entry(_hass: HomeAssistant,
-                            _entry: ConfigEntry,
+async def async_setup_entry(hass: HomeAssistant,
+                            entry: ConfigEntry,
                             async_add_entities: Callable[[list, bool], None]):
-    devs = []
-    for device in InControl2Device.get_devices():
-        devs.append(InControl2Vehicle(device, {}))
+    coordinator = entry.runtime_data
 
-        for wan in device.wans:
-            devs.append(InControl2WanStatus(wan["id"], wan, device, {}))
+    @callback
+    def add_devices(devices: list) -> None:
+        devs = []
+        for device in devices:
+            devs.append(InControl2Vehicle(coordinator, device, {}))
 
-    async_add_entities(devs, True)
+            for wan in device.wans:
+                devs.append(InControl2WanStatus(coordinator, wan.id, wan, device, {}))
 
+        async_add_entities(devs)
 
-class InControl2Vehicle(BinarySensorEntity):
+    @callback
+    def add_wans(device: InControl2Device, wans: list) -> None:
+        async_add_entities([InControl2WanStatus(coordinator, wan.id, wan, device, {}) for wan in wans])
 
-    def __init__(self, vehicle: InControl2Device, store):
+    add_devices(InControl2Device.get_devices(coordinator.connection))
+    entry.async_on_unload(async_dispatcher_connect(hass, SIGNAL_NEW_DEVICES.format(entry.entry_id), add_devices))
+    entry.async_on_unload(async_dispatcher_connect(hass, SIGNAL_NEW_WANS.format(entry.entry_id), add_wans))
+
+
+class InControl2Vehicle(InControl2Entity, BinarySensorEntity):
+    _attribute_keys = ('serial', 'product_name', 'firmware', 'client_count', 'uptime', 'last_online')
+    _unrecorded_attributes = frozenset({'client_count', 'uptime', 'circuit_breakers'})
+
+    def __init__(self, coordinator: InControl2Coordinator, vehicle: InControl2Device, store):
         """Initialize the sensor."""
-        self._vehicle = vehicle
+        super().__init__(coordinator, vehicle)
         self._store = store
         self._data = {}
 
         self._vehicle.add_entity(self)
 
+    def _inputs_changed(self) -> bool:
+        return self._vehicle.has_changed(CHANGED_DATA, CHANGED_CIRCUITS)
+
     @property
     def name(self):
         """Return the name of the sensor."""
         return f'{self._vehicle.name} Status'
 
-    async def async_update(self) -> bool:
-        await self._vehicle.update()
-
-        return True
-
     @property
     def is_on(self) -> bool:
         return self._vehicle.state != "online"
@@ -69,45 +86,56 @@ class InControl2Vehicle(BinarySensorEntity):
                 # Serial numbers are unique identifiers within a specific domain
                 (DOMAIN, self.unique_id)
             },
-            "name": self._vehicle.data.get("name"),
+            "name": self._vehicle.data.name,
             "manufacturer": PEPLINK,
-            "model": self._vehicle.data.get("product_name"),
-            "sw_version": self._vehicle.data.get("fw_ver "),
+            "model": self._vehicle.data.product_name,
+            "sw_version": self._vehicle.data.firmware,
         }
 
     @property
-    def state_attributes(self):
+    def extra_state_attributes(self):
         """Return the state attributes of the vehicle."""
-        return self._vehicle.data
+        attributes = self._project_attributes(self._vehicle.data, self._attribute_keys)
+        circuits = self._vehicle.circuit_states
+        if circuits:
+            attributes = dict(attributes, circuit_breakers=circuits)
 
+        return attributes
 
-class InControl2WanStatus(BinarySensorEntity):
 
-    def __init__(self, wan_id, wan, vehicle, store):
+class InControl2WanStatus(InControl2Entity, BinarySensorEntity):
+    _attribute_keys = ('type', 'virtual_type', 'status', 'message', 'ip')
+    _unrecorded_attributes = frozenset({'message', 'signal', 'signal_bar', 'stale'})
+
+    def __init__(self, coordinator, wan_id, wan, vehicle, store):
         """Initialize the sensor."""
+        super().__init__(coordinator, vehicle)
         self._wan_id = wan_id
         self._wan = wan
-        self._vehicle = vehicle
         self._store = store
         self._data = {}
 
         self._vehicle.add_entity(self)
 
-    async def async_update(self) -> bool:
-        await self._vehicle.update()
-
-        wan = next((wan for wan in self._vehicle.wans if wan.get(
-            'id') == self._wan_id), None)
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        wan = self._vehicle.get_wan(self._wan_id)
 
         if wan is None:
             _LOGGER.debug(f"WAN id {self._wan_id} not found in update")
-            return False
+        else:
+            _LOGGER.debug(f"WAN id {self._wan_id} updated: {wan}")
+            self._wan = wan
 
-        _LOGGER.debug(f"WAN id {self._wan_id} updated: {wan}")
+        super()._handle_coordinator_update()
 
-        self._wan = wan
+    def _inputs_changed(self) -> bool:
+        # The WAN and the device name and status, not the device's counters
+        return self._vehicle.has_changed(CHANGED_STATUS, ('wan', self._wan_id))
 
-        return True
+    @property
+    def wan_id(self) -> int:
+        return self._wan_id
 
     @property
     def name(self):
@@ -116,12 +144,11 @@ class InControl2WanStatus(BinarySensorEntity):
 
     @property
     def wan_name(self):
-        return self._wan.get('name')
+        return self._wan.name
 
     @property
     def is_connected(self):
-        status = self._wan.get("status")
-        return "Connected" in status
+        return self._wan.is_connected
 
     @property
     def device_id(self):
@@ -138,10 +165,10 @@ class InControl2WanStatus(BinarySensorEntity):
                 # Serial numbers are unique identifiers within a specific domain
                 (DOMAIN, self.device_id)
             },
-            "name": self._vehicle.data.get("name"),
+            "name": self._vehicle.data.name,
             "manufacturer": PEPLINK,
-            "model": self._vehicle.data.get("product_name"),
-            "sw_version": self._vehicle.data.get("fw_ver "),
+            "model": self._vehicle.data.product_name,
+            "sw_version": self._vehicle.data.firmware,
         }
 
     @property
@@ -149,17 +176,14 @@ class InControl2WanStatus(BinarySensorEntity):
         return BinarySensorDeviceClass.CONNECTIVITY
 
     @property
-    def state_attributes(self):
-        return self._wan
+    def extra_state_attributes(self):
+        return dict(self._project_attributes(self._wan, self._attribute_keys), stale=self._vehicle.wans_stale)
 
     @property
     def is_on(self) -> bool | None:
         """Return if the sensor is on or off."""
-        if "Connected" in self._wan.get('status'):
-            return True
-        else:
-            return False
+        return self._wan.is_connected
 
     @property
     def entity_registry_enabled_default(self) -> bool:
-        return self._wan.get("is_enable") == 1
+        return self._wan.is_enable == 1
@@ -1,12 +1,22 @@
 """Config flow for InControl2."""
 import logging
 
-from .incontrol2 import InControl2OAuth, InControl2OauthError
+from .incontrol2 import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_DEVICE_TIMEOUT,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_REQUEST_BUDGET,
+    DEFAULT_SCAN_INTERVAL,
+    InControl2OAuth,
+    InControl2OauthError,
+)
 
 import voluptuous as vol
 from aiohttp.web import Response, HTTPBadRequest, Request
 from homeassistant import config_entries
 from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import callback
+from homeassistant.data_entry_flow import UnknownFlow
 from homeassistant.helpers.storage import Store
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.network import get_url
@@ -18,17 +28,34 @@ from .const import (
     AUTH_CALLBACK_PATH,
     CONF_CLIENT_ID,
     CONF_CLIENT_SECRET,
+    CONF_CONCURRENCY,
+    CONF_DEVICE_TIMEOUT,
+    CONF_FULL_ATTRIBUTES,
+    CONF_RATE_LIMIT,
+    CONF_RATE_LIMIT_PER_ORG,
+    CONF_REQUEST_BUDGET,
+    CONF_SCAN_INTERVAL,
+    CONF_SKIP_OFFLINE,
+    CONF_STREAMING_PARSE,
+    CONF_TRACE_SAMPLE_RATE,
     DOMAIN,
     STORAGE_KEY,
     STORAGE_VERSION,
     INCONTROL_URL
 )
 
-DATA_INCONTROL2_IMPL = "incontrol2_flow_implementation"
+DATA_INCONTROL2_VIEW = "incontrol2_callback_view"
+# Steps waiting for the callback view to pass on the authorization code
+AUTHORIZE_STEPS = ("auth", "reauth_confirm")
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def token_store(hass, client_id: str) -> Store:
+    """Return the token store of an account, keyed like the config entry unique id."""
+    return Store(hass=hass, key=f"{STORAGE_KEY}_{client_id[-5:]}", version=STORAGE_VERSION)
+
+
 @config_entries.HANDLERS.register("incontrol2")
 class Incontrol2FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow."""
@@ -40,16 +67,21 @@ class Incontrol2FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         """Initialize flow."""
         self._registered_view = False
         self._oauth = None
+        self._config = {}
+        self._code = None
         self.data_schema = {
             vol.Required(CONF_CLIENT_ID): str,
             vol.Required(CONF_CLIENT_SECRET): str,
         }
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry):
+        """Get the options flow for this handler."""
+        return Incontrol2OptionsFlowHandler(config_entry)
+
     async def async_step_user(self, user_input=None) -> dict:
         """Handle external yaml configuration."""
-        if self.hass.config_entries.async_entries(DOMAIN):
-            return self.async_abort(reason="already_setup")
-
         if not user_input:
             cb_url = self._cb_url()
             return self.async_show_form(
@@ -61,50 +93,27 @@ class Incontrol2FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                 data_schema=vol.Schema(self.data_schema),
             )
 
-        self.hass.data[DATA_INCONTROL2_IMPL] = user_input
+        self._config = dict(user_input)
 
         return await self.async_step_auth()
 
     async def async_step_auth(self, user_input=None) -> dict:
-        """Handle a flow start."""
-
-        config = self.hass.data[DATA_INCONTROL2_IMPL]
-
-        if self.hass.config_entries.async_entries(DOMAIN):
-            return self.async_abort(reason="already_setup")
-
-        errors = {}
-
-        if "code" in config:
-            return await self.async_step_code(config["code"])
-
+        """Send the user to authorize the app, the callback view passes on the code."""
         if user_input is not None:
-            errors["base"] = "follow_link"
-
-        if not self._registered_view:
-            self._generate_view()
-
-        auth_url = await self._get_authorize_url()
-        cb_url = self._cb_url()
+            self._code = user_input["code"]
+            return self.async_external_step_done(next_step_id="code")
 
-        return self.async_show_form(
-            step_id="auth",
-            description_placeholders={
-                "authorization_url": auth_url,
-                "cb_url": cb_url,
-            },
-            errors=errors,
-        )
+        return await self._async_authorize_step("auth")
 
-    async def async_step_code(self, code: str = None) -> dict:
+    async def async_step_code(self, user_input=None) -> dict:
         """Received code for authentication."""
 
         try:
-            await self._get_token_info(code)
+            await self._get_token_info(self._code)
         except InControl2OauthError:
             return self.async_abort(reason="access_token")
 
-        config = self.hass.data[DATA_INCONTROL2_IMPL].copy()
+        config = dict(self._config)
         config["callback_url"] = self._cb_url()
 
         id = config.get(CONF_CLIENT_ID)[-5:]
@@ -122,14 +131,33 @@ class Incontrol2FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         return token_info
 
     def _generate_view(self) -> None:
-        self.hass.http.register_view(Incontrol2AuthCallbackView())
+        # The view outlives the flow, so it is registered once for every account
+        if not self.hass.data.get(DATA_INCONTROL2_VIEW):
+            self.hass.http.register_view(Incontrol2AuthCallbackView())
+            self.hass.data[DATA_INCONTROL2_VIEW] = True
         self._registered_view = True
 
+    async def _async_authorize_step(self, step_id: str) -> dict:
+        if not self._registered_view:
+            self._generate_view()
+
+        auth_url = await self._get_authorize_url()
+        cb_url = self._cb_url()
+
+        return self.async_external_step(
+            step_id=step_id,
+            url=auth_url,
+            description_placeholders={
+                "authorization_url": auth_url,
+                "cb_url": cb_url,
+            },
+        )
+
     def _generate_oauth(self) -> InControl2OAuth:
-        config = self.hass.data[DATA_INCONTROL2_IMPL]
+        config = self._config
         clientsession = async_get_clientsession(self.hass)
         callback_url = self._cb_url()
-        store = Store(hass=self.hass, key=STORAGE_KEY, version=STORAGE_VERSION)
+        store = token_store(self.hass, config.get(CONF_CLIENT_ID))
 
         oauth = InControl2OAuth(
             config.get(CONF_CLIENT_ID),
@@ -145,7 +173,8 @@ class Incontrol2FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def _get_authorize_url(self) -> str:
         oauth = self._generate_oauth()
-        return oauth.get_authorize_url()
+        # The state routes the authorization code back to this flow
+        return oauth.get_authorize_url(state=self.flow_id)
 
     """Config flow to handle re-authentication."""
 
@@ -153,57 +182,31 @@ class Incontrol2FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         self, entry_data: Mapping[str, Any]
     ):
         """Perform reauth upon an API authentication error."""
-        # Clear old code
-        if DATA_INCONTROL2_IMPL not in self.hass.data or self.hass.data[DATA_INCONTROL2_IMPL] is None:
-            if entry_data is not None:
-                if "code" in entry_data:
-                    del entry_data["code"]
-
-                self.hass.data[DATA_INCONTROL2_IMPL] = entry_data
-            else:
-                self.hass.data[DATA_INCONTROL2_IMPL] = {}
+        # Only called when the flow starts. Entries created by older versions also stored the
+        # authorization code
+        self._config = {key: value for key, value in entry_data.items() if key != "code"}
 
         return await self.async_step_reauth_confirm()
 
     async def async_step_reauth_confirm(
         self, user_input: dict[str, Any] | None = None
     ):
-        """Dialog that informs the user that reauth is required."""
-
-        config = self.hass.data[DATA_INCONTROL2_IMPL]
-
-        errors = {}
-
-        if "code" in config:
-            return await self.async_step_reauth_code(config["code"])
-
+        """Send the user to authorize the app again, the callback view passes on the code."""
         if user_input is not None:
-            errors["base"] = "follow_link"
+            self._code = user_input["code"]
+            return self.async_external_step_done(next_step_id="reauth_code")
 
-        if not self._registered_view:
-            self._generate_view()
+        return await self._async_authorize_step("reauth_confirm")
 
-        auth_url = await self._get_authorize_url()
-        cb_url = self._cb_url()
-
-        return self.async_show_form(
-            step_id="reauth",
-            description_placeholders={
-                "authorization_url": auth_url,
-                "cb_url": cb_url,
-            },
-            errors=errors,
-        )
-
-    async def async_step_reauth_code(self, code: str = None) -> dict:
+    async def async_step_reauth_code(self, user_input=None) -> dict:
         """Received code for authentication."""
 
         try:
-            await self._get_token_info(code)
+            await self._get_token_info(self._code)
         except InControl2OauthError:
             return self.async_abort(reason="access_token")
 
-        config = self.hass.data[DATA_INCONTROL2_IMPL].copy()
+        config = dict(self._config)
         config["callback_url"] = self._cb_url()
 
         id = config.get(CONF_CLIENT_ID)[-5:]
@@ -216,6 +219,39 @@ class Incontrol2FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         return self.async_abort(reason="reauth_successful")
 
 
+class Incontrol2OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle InControl2 polling options."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry):
+        """Initialize options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input=None) -> dict:
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+
+        def optional(key: str, default: Any) -> vol.Optional:
+            return vol.Optional(key, default=options.get(key, default))
+
+        data_schema = {
+            optional(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL): vol.All(vol.Coerce(int), vol.Range(min=60)),
+            optional(CONF_CONCURRENCY, DEFAULT_CONCURRENCY): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+            optional(CONF_DEVICE_TIMEOUT, DEFAULT_DEVICE_TIMEOUT): vol.All(vol.Coerce(int), vol.Range(min=5)),
+            optional(CONF_REQUEST_BUDGET, DEFAULT_REQUEST_BUDGET): vol.All(vol.Coerce(int), vol.Range(min=60)),
+            optional(CONF_RATE_LIMIT, DEFAULT_RATE_LIMIT): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=100)),
+            optional(CONF_RATE_LIMIT_PER_ORG, False): bool,
+            optional(CONF_SKIP_OFFLINE, True): bool,
+            optional(CONF_STREAMING_PARSE, False): bool,
+            optional(CONF_FULL_ATTRIBUTES, False): bool,
+            optional(CONF_TRACE_SAMPLE_RATE, 0): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+        }
+
+        return self.async_show_form(step_id="init", data_schema=vol.Schema(data_schema))
+
+
 class Incontrol2AuthCallbackView(HomeAssistantView):
     """Incontrol2 Authorization Callback View."""
 
@@ -230,7 +266,20 @@ class Incontrol2AuthCallbackView(HomeAssistantView):
         if code is None:
             return Response(text="No code was provided", status=HTTPBadRequest.status_code)
 
+        state = request.query.get("state")
+        if state is None:
+            return Response(text="No state was provided", status=HTTPBadRequest.status_code)
+
+        # The state is the id of the flow that sent the user to authorize the app
         hass = request.app["hass"]
-        hass.data[DATA_INCONTROL2_IMPL]["code"] = code
+        try:
+            flow = hass.config_entries.flow.async_get(state)
+        except UnknownFlow:
+            flow = None
+        if flow is None or flow["handler"] != DOMAIN or flow.get("step_id") not in AUTHORIZE_STEPS:
+            return Response(text="No authorization is in progress for this state",
+                            status=HTTPBadRequest.status_code)
+
+        await hass.config_entries.flow.async_configure(flow_id=state, user_input={"code": code})
 
         return Response(text="Authentication was successful. You can close this window.")
@@ -3,10 +3,26 @@
 CONF_CLIENT_ID = "client_id"
 CONF_CLIENT_SECRET = "client_secret"
 CONF_SCAN_INTERVAL = "scan_interval"
+CONF_CONCURRENCY = "concurrency"
+CONF_DEVICE_TIMEOUT = "device_timeout"
+CONF_REQUEST_BUDGET = "request_budget"
+CONF_STREAMING_PARSE = "streaming_parse"
+CONF_FULL_ATTRIBUTES = "full_attributes"
+CONF_RATE_LIMIT = "rate_limit"
+CONF_RATE_LIMIT_PER_ORG = "rate_limit_per_org"
+CONF_SKIP_OFFLINE = "skip_offline"
+CONF_TRACE_SAMPLE_RATE = "trace_sample_rate"
 DOMAIN = "incontrol2"
 STORAGE_KEY = "incontrol2_auth"
 STORAGE_VERSION = 1
-DATA_INCONTROL2 = "incontrol2"
+SNAPSHOT_STORAGE_KEY = "incontrol2_snapshot"
+SNAPSHOT_STORAGE_VERSION = 1
+# Seconds; the snapshot is also written on unload and shutdown
+SNAPSHOT_SAVE_DELAY = 900
+# Formatted with the config entry id
+SIGNAL_NEW_DEVICES = "incontrol2_new_devices_{}"
+SIGNAL_NEW_WANS = "incontrol2_new_wans_{}"
+TRACE_FILENAME = "incontrol2_trace_{}.json"
 
 PEPLINK = "PepLink"
 SIGNAL_UNITS = "dB"
@@ -0,0 +1,141 @@
+"""Data update coordinator for InControl2."""
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Mapping, Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .incontrol2 import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_DEVICE_TIMEOUT,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_REQUEST_BUDGET,
+    DEFAULT_SCAN_INTERVAL,
+    POLL_INTERVAL_MIN,
+    InControl2Connection,
+    InControl2Device,
+    InControl2Org,
+    InControl2RequestBudget,
+    InControl2Timeout,
+    InControl2ClientError,
+    InControl2UnknownError,
+)
+from .const import (
+    CONF_CONCURRENCY,
+    CONF_DEVICE_TIMEOUT,
+    CONF_FULL_ATTRIBUTES,
+    CONF_RATE_LIMIT,
+    CONF_RATE_LIMIT_PER_ORG,
+    CONF_REQUEST_BUDGET,
+    CONF_SCAN_INTERVAL,
+    CONF_SKIP_OFFLINE,
+    CONF_STREAMING_PARSE,
+    CONF_TRACE_SAMPLE_RATE,
+    DOMAIN,
+    SNAPSHOT_SAVE_DELAY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+SCAN_INTERVAL = timedelta(seconds=DEFAULT_SCAN_INTERVAL)
+
+
+class InControl2Coordinator(DataUpdateCoordinator):
+    """Owns the refresh schedule for all InControl2 devices of a config entry.
+
+    The coordinator ticks at the fastest adaptive interval; each tick only
+    polls the devices that are due, within the hourly request budget.
+    """
+
+    def __init__(self, hass: HomeAssistant, connection: InControl2Connection, options: Mapping[str, Any] = None,
+                 snapshot_store: Store = None):
+        super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=SCAN_INTERVAL)
+        self.connection = connection
+        self.snapshot_store = snapshot_store
+        self.scan_interval = DEFAULT_SCAN_INTERVAL
+        self.concurrency = DEFAULT_CONCURRENCY
+        self.device_timeout = DEFAULT_DEVICE_TIMEOUT
+        self.budget = InControl2RequestBudget(DEFAULT_REQUEST_BUDGET)
+        self.full_attributes = False
+        # Serializes discovery runs from startup, the periodic timer and the service
+        self.discovery_lock = asyncio.Lock()
+        self._snapshot_pending = False
+        self.apply_options(options or {})
+
+    def apply_options(self, options: Mapping[str, Any]) -> None:
+        """Apply config entry options without reloading the entry."""
+        self.scan_interval = options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+        self.update_interval = timedelta(seconds=min(POLL_INTERVAL_MIN, self.scan_interval))
+        self.concurrency = options.get(CONF_CONCURRENCY, DEFAULT_CONCURRENCY)
+        self.device_timeout = options.get(CONF_DEVICE_TIMEOUT, DEFAULT_DEVICE_TIMEOUT)
+        request_budget = options.get(CONF_REQUEST_BUDGET, DEFAULT_REQUEST_BUDGET)
+        if request_budget != self.budget.requests_per_hour:
+            self.budget = InControl2RequestBudget(request_budget)
+        rate_limit = options.get(CONF_RATE_LIMIT, DEFAULT_RATE_LIMIT)
+        per_org = options.get(CONF_RATE_LIMIT_PER_ORG, False)
+        limiter = self.connection.rate_limiter
+        if (rate_limit, per_org) != (limiter.rate, limiter.per_org):
+            limiter.configure(rate_limit, per_org=per_org)
+        self.connection.streaming = options.get(CONF_STREAMING_PARSE, False)
+        self.connection.skip_offline = options.get(CONF_SKIP_OFFLINE, True)
+        self.full_attributes = options.get(CONF_FULL_ATTRIBUTES, False)
+        self.connection.keep_raw = self.full_attributes
+        self.connection.tracer.sample_rate = options.get(CONF_TRACE_SAMPLE_RATE, 0)
+
+    async def async_apply_options(self, options: Mapping[str, Any]) -> None:
+        """Apply config entry options, including those that resize the connection."""
+        await self.connection.set_concurrency(options.get(CONF_CONCURRENCY, DEFAULT_CONCURRENCY))
+        self.apply_options(options)
+
+    async def _async_update_data(self) -> dict:
+        """Return the per-device update results of this cycle."""
+        _LOGGER.debug("Scheduled update of due devices")
+        self.connection.tracer.start_cycle()
+        try:
+            return await InControl2Device.update_all(self.connection, self.concurrency, self.device_timeout,
+                                                     self.scan_interval, self.budget)
+        except (InControl2Timeout, InControl2ClientError, InControl2UnknownError) as err:
+            raise UpdateFailed(f"Error updating InControl2 devices: {err}") from err
+
+    @callback
+    def async_save_snapshot(self) -> None:
+        """Save the discovered devices and their last known state within SNAPSHOT_SAVE_DELAY.
+
+        A pending save writes the state at the time it runs; delaying it again on every change
+        would postpone it for as long as the devices keep changing.
+        """
+        if self.snapshot_store is not None and not self._snapshot_pending:
+            self._snapshot_pending = True
+            self.snapshot_store.async_delay_save(self._snapshot, SNAPSHOT_SAVE_DELAY)
+
+    def _snapshot(self) -> dict:
+        self._snapshot_pending = False
+        return InControl2Org.snapshot_all(self.connection)
+
+    async def async_shutdown(self) -> None:
+        """Stop refreshing, write the pending snapshot and release the connection and its devices."""
+        await super().async_shutdown()
+        # A cleared connection would overwrite the snapshot with an empty one
+        if self.snapshot_store is not None and self.connection.orgs:
+            await self.snapshot_store.async_save(self._snapshot())
+        await self.connection.close()
+        self.connection.clear()
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update all listeners, closing the traced cycle once the entity state writes are done.
+
+        Device changes are kept until this point, so changes recorded outside a poll cycle,
+        e.g. by a discovery, also reach the entities and the snapshot.
+        """
+        with self.connection.tracer.span('update_listeners'):
+            super().async_update_listeners()
+        devices = InControl2Device.get_devices(self.connection)
+        if any(device.snapshot_changed() for device in devices):
+            self.async_save_snapshot()
+        for device in devices:
+            device.clear_changes()
+        self.connection.tracer.end_cycle()
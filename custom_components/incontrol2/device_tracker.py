@@ -3,9 +3,12 @@
 import logging
 from typing import Callable
 
-from .incontrol2 import InControl2Device
-from homeassistant.core import HomeAssistant
+from .incontrol2 import CHANGED_LOCATION, CHANGED_STATUS, InControl2Device
+from .coordinator import InControl2Coordinator
+from .entity import InControl2Entity
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.components.device_tracker.config_entry import TrackerEntity
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.components.device_tracker.const import (
@@ -13,40 +16,48 @@ from homeassistant.components.device_tracker.const import (
 )
 
 from .const import (
-    DOMAIN
+    DOMAIN,
+    SIGNAL_NEW_DEVICES,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def async_setup_entry(_hass: HomeAssistant,
-                            _entry: ConfigEntry,
+async def async_setup_entry(hass: HomeAssistant,
+                            entry: ConfigEntry,
                             async_add_entities: Callable[[list, bool], None]) -> None:
     """Set up the InControl2 device from config entry."""
-    devs = []
-    for device in InControl2Device.get_devices():
-        devs.append(InControl2DeviceTracker(device, {}))
+    coordinator = entry.runtime_data
 
-    async_add_entities(devs, True)
+    @callback
+    def add_devices(devices: list) -> None:
+        async_add_entities([InControl2DeviceTracker(coordinator, device, {}) for device in devices])
 
+    add_devices(InControl2Device.get_devices(coordinator.connection))
+    entry.async_on_unload(async_dispatcher_connect(hass, SIGNAL_NEW_DEVICES.format(entry.entry_id), add_devices))
 
-class InControl2DeviceTracker(TrackerEntity, RestoreEntity):
 
-    def __init__(self, vehicle: InControl2Device, store):
+class InControl2DeviceTracker(InControl2Entity, TrackerEntity, RestoreEntity):
+    _attribute_keys = ('altitude', 'speed', 'heading', 'timestamp')
+    _unrecorded_attributes = frozenset(_attribute_keys + ('stale',))
+
+    def __init__(self, coordinator: InControl2Coordinator, vehicle: InControl2Device, store):
         """Initialize the sensor."""
-        """Initialize the thermostat."""
-        self._vehicle = vehicle
+        super().__init__(coordinator, vehicle)
         self._store = store
         self._data = {}
         self._state = 'offline'
 
         self._vehicle.add_entity(self)
 
-    async def async_update(self) -> bool:
-        await self._vehicle.update()
-
+    @callback
+    def _handle_coordinator_update(self) -> None:
         _LOGGER.debug(f"lat: {self.latitude}, long: {self.longitude}")
-        return True
+        super()._handle_coordinator_update()
+
+    def _inputs_changed(self) -> bool:
+        # The location and the device name and status, not the device's counters
+        return self._vehicle.has_changed(CHANGED_STATUS, CHANGED_LOCATION)
 
     @property
     def name(self):
@@ -65,13 +76,15 @@ class InControl2DeviceTracker(TrackerEntity, RestoreEntity):
     def latitude(self):
         """Return latitude value of the device."""
 
-        return self._vehicle.location.get('latitude')
+        location = self._vehicle.location
+        return location.latitude if location is not None else None
 
     @property
     def longitude(self):
         """Return longitude value of the device."""
 
-        return self._vehicle.location.get('longitude')
+        location = self._vehicle.location
+        return location.longitude if location is not None else None
 
     @property
     def source_type(self):
@@ -85,13 +98,17 @@ class InControl2DeviceTracker(TrackerEntity, RestoreEntity):
                 # Serial numbers are unique identifiers within a specific domain
                 (DOMAIN, self.unique_id)
             },
-            "name": self._vehicle.data.get("name"),
+            "name": self._vehicle.data.name,
             "manufacturer": "PepLink",
-            "model": self._vehicle.data.get("product_name"),
-            "sw_version": self._vehicle.data.get("fw_ver "),
+            "model": self._vehicle.data.product_name,
+            "sw_version": self._vehicle.data.firmware,
         }
 
     @property
-    def state_attributes(self):
-        """Return the state attributes of the sun."""
-        return self._vehicle.location
+    def extra_state_attributes(self):
+        """Return the state attributes of the location."""
+        attributes = self._project_attributes(self._vehicle.location, self._attribute_keys)
+        if attributes:
+            attributes = dict(attributes, stale=self._vehicle.location_stale)
+
+        return attributes
@@ -0,0 +1,36 @@
+"""Diagnostics support for InControl2."""
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .incontrol2 import CIRCUIT_CLOSED
+from .const import CONF_CLIENT_ID, CONF_CLIENT_SECRET
+
+TO_REDACT = {CONF_CLIENT_ID, CONF_CLIENT_SECRET, "code"}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator = entry.runtime_data
+    connection = coordinator.connection
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "discovery": connection.discovery_stats,
+        "devices": len(connection.devices),
+        "connection": {
+            "requests": connection.request_count,
+            "cache": connection.cache.stats,
+            "pool": connection.pool_stats,
+            "retries": connection.retry_policy.stats,
+            "rate_limiter": connection.rate_limiter.stats,
+            "open_circuits": {command: breaker.state for command, breaker in connection.breakers.items()
+                              if breaker.state != CIRCUIT_CLOSED},
+        },
+        "endpoints": connection.metrics.stats,
+    }
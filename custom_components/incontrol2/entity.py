@@ -0,0 +1,45 @@
+"""Base entity for InControl2."""
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .incontrol2 import CHANGED_DATA, InControl2Device, InControl2Model
+from .coordinator import InControl2Coordinator
+
+
+class InControl2Entity(CoordinatorEntity):
+    """Coordinator entity that only writes state when its inputs changed."""
+
+    def __init__(self, coordinator: InControl2Coordinator, vehicle: InControl2Device):
+        super().__init__(coordinator)
+        self._vehicle = vehicle
+        self._was_available = None
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Drop the device's reference to this entity."""
+        await super().async_will_remove_from_hass()
+        self._vehicle.remove_entity(self)
+
+    def _inputs_changed(self) -> bool:
+        """Return whether the device data this entity depends on changed."""
+        return self._vehicle.has_changed(CHANGED_DATA)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        if self.available == self._was_available and not self._inputs_changed():
+            return
+
+        self._was_available = self.available
+        with self.coordinator.connection.tracer.span('write_state', device_id=self._vehicle.device_id,
+                                                     entity=self.entity_id):
+            super()._handle_coordinator_update()
+
+    def _project_attributes(self, model: InControl2Model, keys: tuple) -> dict:
+        """Return the curated attributes of a model, or all of them in full mode."""
+        if model is None:
+            return {}
+
+        if self.coordinator.full_attributes:
+            return getattr(model, 'raw', None) or model.as_dict()
+
+        return {key: getattr(model, key) for key in keys}
@@ -1,42 +1,386 @@
 """Library to handle connection with InControl2 API."""
 import asyncio
+import bisect
+import codecs
+import contextlib
+import contextvars
+import functools
 import json
 import logging
+import math
+import random
 import time
-from typing import List
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, fields, replace
+from typing import Any, Callable, Iterator, List
 from aiohttp import ClientSession
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from urllib.parse import urlencode
-from homeassistant.util import Throttle
 from homeassistant.helpers.entity import Entity
 from homeassistant.config_entries import ConfigEntryAuthFailed
 
 import aiohttp
-import async_timeout
 
 DEFAULT_TIMEOUT = 10
+DEFAULT_CONCURRENCY = 10
+DEFAULT_DEVICE_TIMEOUT = 60
+DEFAULT_SCAN_INTERVAL = 600
+DEFAULT_REQUEST_BUDGET = 6000
+# Seconds between background discoveries of new and removed devices
+DISCOVERY_INTERVAL = 60 * 60
+# Tokens are refreshed in the foreground within this many seconds of expiry ...
+TOKEN_EXPIRY_MARGIN = 60 * 60
+# ... and in the background once this fraction of their lifetime remains
+TOKEN_REFRESH_AHEAD_RATIO = 0.25
+# Seconds to wait after a failed background refresh before starting another one
+TOKEN_REFRESH_COOLDOWN = 5 * 60
 API_ENDPOINT = 'https://api.ic.peplink.com/rest/'
 
 _LOGGER = logging.getLogger(__name__)
-MIN_TIME_BETWEEN_UPDATES = timedelta(minutes=5)
+# Ask the group device listing to include status (and interfaces where supported)
+GROUP_DEVICE_PARAMS = {'has_status': 'true'}
+
+# Number of recent location fixes kept per device
+LOCATION_HISTORY_SIZE = 10
+
+# Adaptive polling: moving or flapping devices are polled every POLL_INTERVAL_MIN
+# seconds, offline devices back off to OFFLINE_BACKOFF times the scan interval
+POLL_INTERVAL_MIN = 60
+OFFLINE_BACKOFF = 3
+MOVING_SPEED = 5
+WAN_FLAP_WINDOW = 15 * 60
+# Estimated requests per device refresh (location and interfaces)
+DEVICE_REQUEST_COST = 2
+
+# Response cache: seconds a cached GET is served without asking the API. Endpoints
+# with a TTL of 0 are always revalidated with ETag/Last-Modified; endpoints not
+# listed (e.g. /loc, which is cursor based) are never cached.
+CACHE_TTLS = {
+    'o': 60 * 60,
+    'o/*/g': 60 * 60,
+    'o/*/g/*/d': 0,
+    'o/*/g/*/d/*': 5 * 60,
+    'o/*/g/*/d/*/info/interfaces': 0,
+}
+DEFAULT_CACHE_SIZE = 1024
+
+# Connection pool tuning for sessions owned by InControl2Connection
+DNS_CACHE_TTL = 5 * 60
+KEEPALIVE_TIMEOUT = 60
+
+# Client side rate limiting (requests per second and burst size). A 429 halves
+# the rate (down to RATE_LIMIT_MIN_FACTOR of the configured rate), each success
+# recovers RATE_LIMIT_RECOVERY of it.
+DEFAULT_RATE_LIMIT = 5.0
+DEFAULT_RATE_BURST = 10
+RATE_LIMIT_MIN_FACTOR = 0.1
+RATE_LIMIT_RECOVERY = 0.05
+DEFAULT_RETRY_AFTER = 30
+
+# Retries of transient failures: exponential backoff with full jitter, capped at
+# RETRY_MAX_DELAY seconds per wait and RETRY_DEADLINE seconds per call overall
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 30
+RETRY_DEADLINE = 60
+
+# Circuit breakers on device endpoints: open after CIRCUIT_FAILURE_THRESHOLD failed
+# requests in a row, then let a single probe through every CIRCUIT_RESET_TIMEOUT seconds
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_RESET_TIMEOUT = 5 * 60
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+# Upper bounds (seconds) of the per-endpoint latency histogram buckets; slower requests
+# land in a final overflow bucket
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Poll cycle tracing: events kept per traced cycle
+TRACE_MAX_EVENTS = 50000
+
+# Interface keys kept when WAN payloads are parsed in streaming mode
+WAN_FIELDS = ('id', 'name', 'type', 'virtualType', 'status', 'status_led', 'message',
+              'is_enable', 'ip', 'signal', 'signal_bar')
+
+# Keys reported by InControl2Device.has_changed; WANs use ('wan', id)
+CHANGED_DATA = 'data'
+# The device data except the counters that change on every poll, see InControl2DeviceStatus.identity
+CHANGED_STATUS = 'status'
+CHANGED_LOCATION = 'location'
+CHANGED_CIRCUITS = 'circuits'
+
+UPDATE_OK = 'ok'
+UPDATE_TIMEOUT = 'timeout'
+UPDATE_ERROR = 'error'
+UPDATE_SKIPPED = 'skipped'
+
+
+def retry(retry_on: tuple = (), return_value=None):
+    """Retry a device method through its connection's retry policy.
+
+    Failures in `retry_on` are retried on top of the transient errors already retried
+    per request; `return_value` is returned once they are exhausted.
+    """
 
+    def retry_decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await self.session.retry_policy.call(func, self, *args, retryable=retry_on,
+                                                            description=func.__name__, **kwargs)
+            except retry_on:
+                return return_value
 
-def retry(times=3, backoff=10, return_value=None):
+        return wrapper
 
-    def retry_decorator(func):
-        async def wrapper(*original_args, **original_kwargs):
-            for attempt in range(times):
-                result = await func(*original_args, **original_kwargs)
-                if bool(result):
-                    return result
+    return retry_decorator
 
-                await asyncio.sleep(backoff * attempt)
 
-            return return_value
+_JSON_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+# Characters that may follow a complete value
+_DELIMITERS = _WHITESPACE + ',:]}'
+# Bytes of the body decoded to text at a time by the streaming parsers
+STREAM_CHUNK_SIZE = 16 * 1024
 
-        return wrapper
 
-    return retry_decorator
+def parse_json(body: bytes) -> Any:
+    """Parse a response body straight from bytes."""
+    if not body:
+        return None
+
+    return json.loads(body)
+
+
+def iter_json_array(body: bytes, key: str = 'data') -> Iterator[Any]:
+    """Yield the elements of a top-level array one at a time.
+
+    The body is decoded in chunks and only one element is materialized at a
+    time, so callers that keep a few elements never hold the whole payload as
+    text or as decoded objects.
+    """
+    stream = _JsonStream(body)
+    if stream.peek() != '{':
+        return
+
+    stream.advance()
+    while True:
+        if stream.peek() != '"':
+            return
+        name = stream.value()
+        stream.peek()
+        stream.advance()  # the ':' separator
+
+        if name == key and stream.peek() == '[':
+            break
+
+        stream.value()
+        if stream.peek() != ',':
+            return
+        stream.advance()
+
+    stream.advance()
+    while True:
+        if stream.peek() in (']', ''):
+            return
+        yield stream.value()
+        if stream.peek() == ',':
+            stream.advance()
+
+
+class _JsonStream(object):
+    """Decodes consecutive JSON values from a body, holding at most about a chunk of it as text."""
+
+    def __init__(self, body: bytes):
+        self._body = memoryview(body)
+        self._offset = 0
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._text = ''
+        self._index = 0
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the unread text, returning False at the end of the body."""
+        if self._offset >= len(self._body):
+            return False
+
+        chunk = self._body[self._offset:self._offset + STREAM_CHUNK_SIZE]
+        self._offset += len(chunk)
+        self._text = self._text[self._index:] + self._decoder.decode(chunk, self._offset >= len(self._body))
+        self._index = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or '' at the end of the body."""
+        while True:
+            while self._index < len(self._text) and self._text[self._index] in _WHITESPACE:
+                self._index += 1
+            if self._index < len(self._text) or not self._fill():
+                return self._text[self._index:self._index + 1]
+
+    def advance(self) -> None:
+        self._index += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self._text, self._index)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            # A number cut at the end of the text may go on in the next chunk, e.g. `12` | `.5`, so
+            # a value only counts as complete once a delimiter follows it
+            if (end == len(self._text) or self._text[end] not in _DELIMITERS) and self._fill():
+                continue
+
+            self._index = end
+            return value
+
+
+def parse_array_tail(count: int, predicate: Callable[[Any], bool] = None) -> Callable[[bytes], dict]:
+    """Build a parser that keeps only the last `count` matching items of `data`."""
+    def parser(body: bytes) -> dict:
+        if not body:
+            return None
+        items = iter_json_array(body)
+        if predicate is not None:
+            items = filter(predicate, items)
+
+        return {'data': list(deque(items, maxlen=count))}
+
+    return parser
+
+
+def parse_array_fields(fields: tuple) -> Callable[[bytes], dict]:
+    """Build a parser that keeps only the given keys of each item of `data`."""
+    def parser(body: bytes) -> dict:
+        if not body:
+            return None
+
+        return {'data': [{field: item[field] for field in fields if field in item}
+                         for item in iter_json_array(body)]}
+
+    return parser
+
+
+def _keep_raw(keep_raw: bool = False) -> bool:
+    """Raw API dicts are only kept when asked for or while debug logging is enabled."""
+    return keep_raw or _LOGGER.isEnabledFor(logging.DEBUG)
+
+
+class InControl2Model(object):
+    """Helpers shared by the slotted API models."""
+    __slots__ = ()
+
+    def as_dict(self) -> dict:
+        return {model_field.name: getattr(self, model_field.name)
+                for model_field in fields(self) if model_field.name != 'raw'}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Rebuild a model from the output of as_dict, e.g. a stored snapshot."""
+        return cls(**{model_field.name: data.get(model_field.name)
+                      for model_field in fields(cls) if model_field.name != 'raw'})
+
+
+@dataclass(frozen=True, slots=True)
+class InControl2DeviceStatus(InControl2Model):
+    """Device fields parsed from the device or group listing endpoints."""
+    id: int = None
+    name: str = None
+    status: str = None
+    serial: str = None
+    product_name: str = None
+    product_code: str = None
+    firmware: str = None
+    client_count: int = None
+    uptime: int = None
+    last_online: str = None
+    raw: dict = field(default=None, compare=False, repr=False)
+
+    @classmethod
+    def from_api(cls, data: dict, keep_raw: bool = False) -> 'InControl2DeviceStatus':
+        return cls(
+            id=data.get('id'),
+            name=data.get('name'),
+            status=data.get('status'),
+            serial=data.get('sn'),
+            product_name=data.get('product_name'),
+            product_code=data.get('product_code'),
+            firmware=data.get('fw_ver'),
+            client_count=data.get('client_count'),
+            uptime=data.get('uptime'),
+            last_online=data.get('last_online'),
+            raw=data if _keep_raw(keep_raw) else None,
+        )
+
+    @property
+    def identity(self) -> tuple:
+        """Return the fields other than client_count, uptime and last_online, which change on every poll."""
+        return self.id, self.name, self.status, self.serial, self.product_name, self.product_code, self.firmware
+
+
+@dataclass(frozen=True, slots=True)
+class InControl2WanInterface(InControl2Model):
+    """WAN interface fields parsed from /info/interfaces."""
+    id: int = None
+    name: str = None
+    type: str = None
+    virtual_type: str = None
+    status: str = None
+    status_led: str = None
+    message: str = None
+    is_enable: int = None
+    ip: str = None
+    signal: int = None
+    signal_bar: int = None
+    raw: dict = field(default=None, compare=False, repr=False)
+
+    @classmethod
+    def from_api(cls, data: dict, keep_raw: bool = False) -> 'InControl2WanInterface':
+        return cls(
+            id=data.get('id'),
+            name=data.get('name'),
+            type=data.get('type'),
+            virtual_type=data.get('virtualType'),
+            status=data.get('status'),
+            status_led=data.get('status_led'),
+            message=data.get('message'),
+            is_enable=data.get('is_enable'),
+            ip=data.get('ip'),
+            signal=data.get('signal'),
+            signal_bar=data.get('signal_bar'),
+            raw=data if _keep_raw(keep_raw) else None,
+        )
+
+    @property
+    def is_connected(self) -> bool:
+        return 'Connected' in (self.status or '')
+
+
+@dataclass(frozen=True, slots=True)
+class InControl2LocationFix(InControl2Model):
+    """A single point from the /loc history."""
+    latitude: float = None
+    longitude: float = None
+    altitude: float = None
+    speed: float = None
+    timestamp: str = None
+    heading: float = None
+
+    @classmethod
+    def from_api(cls, data: dict) -> 'InControl2LocationFix':
+        return cls(
+            latitude=data.get('la'),
+            longitude=data.get('lo'),
+            altitude=data.get('at'),
+            speed=data.get('sp'),
+            timestamp=data.get('ts'),
+        )
 
 
 class InControl2OauthError(Exception):
@@ -59,6 +403,22 @@ class InControl2UnknownError(Exception):
     pass
 
 
+class InControl2ServerError(InControl2UnknownError):
+    pass
+
+
+class InControl2RateLimited(InControl2UnknownError):
+    pass
+
+
+class InControl2CircuitOpen(Exception):
+    pass
+
+
+class InControl2ConnectionClosed(InControl2UnknownError):
+    pass
+
+
 class InControl2NoWANsFound(Exception):
     pass
 
@@ -78,12 +438,17 @@ class InControl2OAuth(object):
         self.redirect_uri = redirect_uri
         self.websession = websession
         self.store = store
+        self._token_info = None
+        self._refresh_task = None
+        self._next_refresh_attempt = 0
 
-    def get_authorize_url(self) -> str:
-        """Get the URL to use to authorize this app."""
+    def get_authorize_url(self, state: str = None) -> str:
+        """Get the URL to use to authorize this app, passing `state` back to the redirect URI."""
         payload = {'client_id': self.client_id,
                    'response_type': 'code',
                    'redirect_uri': self.redirect_uri}
+        if state is not None:
+            payload['state'] = state
         return self.OAUTH_AUTHORIZE_URL + '?' + urlencode(payload)
 
     async def get_access_token(self, code: str) -> dict:
@@ -95,7 +460,7 @@ class InControl2OAuth(object):
                    'grant_type': 'authorization_code'}
 
         try:
-            with async_timeout.timeout(DEFAULT_TIMEOUT):
+            async with asyncio.timeout(DEFAULT_TIMEOUT):
                 response = await self.websession.post(self.OAUTH_TOKEN_URL,
                                                       data=payload,
                                                       allow_redirects=True)
@@ -118,13 +483,62 @@ class InControl2OAuth(object):
             "Unknown error attempting to get access token")
 
     async def refresh_access_token(self, token_info: dict) -> dict:
-        """Refresh access token."""
+        """Refresh access token, sharing a single in-flight refresh between callers."""
         if token_info is None:
             raise InControl2InvalidToken()
 
+        token_info = self._latest_token(token_info)
         if not is_token_expired(token_info):
             return token_info
 
+        # Shielded so a cancelled caller does not abort the refresh for everyone else
+        return await asyncio.shield(self._start_refresh(token_info))
+
+    async def close(self) -> None:
+        """Cancel a token refresh that is still in flight."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.wait([self._refresh_task])
+
+    def refresh_in_background(self, token_info: dict) -> None:
+        """Start a refresh without waiting for it if the token is nearing expiry."""
+        token_info = self._latest_token(token_info)
+        if is_token_expiring(token_info) and time.monotonic() >= self._next_refresh_attempt:
+            self._start_refresh(token_info)
+
+    def _latest_token(self, token_info: dict) -> dict:
+        if self._token_info is None or self._token_info['expires_at'] < token_info['expires_at']:
+            self._token_info = token_info
+
+        return self._token_info
+
+    def _start_refresh(self, token_info: dict) -> asyncio.Task:
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.ensure_future(self._refresh_access_token(token_info))
+            self._refresh_task.add_done_callback(self._refresh_done)
+
+        return self._refresh_task
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._refresh_task = None
+        if task.cancelled():
+            return
+
+        # Retrieve the exception so background refresh failures are not reported as unhandled.
+        # Foreground callers see the same exception through the awaited task.
+        err = task.exception()
+        if err is None:
+            self._token_info = task.result()
+            self._next_refresh_attempt = 0
+            return
+
+        # The token is still valid, so back off instead of retrying on every request
+        _LOGGER.warning(f"Failed to refresh the InControl2 access token, retrying in "
+                        f"{TOKEN_REFRESH_COOLDOWN}s: {err!r}")
+        self._next_refresh_attempt = time.monotonic() + TOKEN_REFRESH_COOLDOWN
+
+    async def _refresh_access_token(self, token_info: dict) -> dict:
+        _LOGGER.debug("Refreshing InControl2 access token")
         payload = {'client_id': self.client_id,
                    'redirect_uri': self.redirect_uri,
                    'refresh_token': token_info['refresh_token'],
@@ -134,7 +548,7 @@ class InControl2OAuth(object):
         refresh_token = token_info.get('refresh_token')
 
         try:
-            with async_timeout.timeout(DEFAULT_TIMEOUT):
+            async with asyncio.timeout(DEFAULT_TIMEOUT):
                 response = await self.websession.post(self.OAUTH_TOKEN_URL,
                                                       data=payload,
                                                       allow_redirects=True)
@@ -160,160 +574,1044 @@ class InControl2OAuth(object):
             "Unknown error attempting to refresh token")
 
 
+# Failures worth another attempt; anything else (auth, other 4xx) fails immediately
+RETRYABLE_ERRORS = (InControl2Timeout, InControl2ClientError, InControl2ServerError, InControl2RateLimited)
+
+
+class InControl2RetryPolicy(object):
+    """Retries transient failures with exponential backoff and full jitter."""
+
+    def __init__(self, attempts: int = RETRY_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, deadline: float = RETRY_DEADLINE):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retries = 0
+        self.exhausted = 0
+        self.deadline_exceeded = 0
+
+    def delay(self, attempt: int) -> float:
+        """Return a random wait before the given retry (1 based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def call(self, func: Callable, *args, attempts: int = None, retryable: tuple = RETRYABLE_ERRORS,
+                   description: str = None, on_retry: Callable[[Exception], None] = None, **kwargs) -> Any:
+        """Await func(*args, **kwargs), retrying failures in `retryable`.
+
+        `on_retry` is called with the error before each retry.
+        """
+        attempts = attempts or self.attempts
+        description = description or func.__name__
+        started = time.monotonic()
+        for attempt in range(1, attempts + 1):
+            try:
+                return await func(*args, **kwargs)
+            except retryable as err:
+                if attempt == attempts:
+                    self.exhausted += 1
+                    _LOGGER.warning(f"Giving up on {description} after {attempt} attempts: {err!r}")
+                    raise
+
+                delay = self.delay(attempt)
+                if time.monotonic() - started + delay > self.deadline:
+                    self.deadline_exceeded += 1
+                    _LOGGER.warning(f"Giving up on {description}, retry deadline exceeded: {err!r}")
+                    raise
+
+                self.retries += 1
+                if on_retry is not None:
+                    on_retry(err)
+                _LOGGER.debug(f"Retrying {description} in {delay:.1f}s (attempt {attempt}): {err!r}")
+                await asyncio.sleep(delay)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'retries': self.retries,
+            'exhausted': self.exhausted,
+            'deadline_exceeded': self.deadline_exceeded,
+        }
+
+
+class InControl2CircuitBreaker(object):
+    """Stops calling an endpoint that keeps failing until a probe succeeds."""
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Return whether a call may go ahead; the first one after the reset timeout is the probe."""
+        if self.state == CIRCUIT_CLOSED:
+            return True
+
+        if self.state == CIRCUIT_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = CIRCUIT_HALF_OPEN
+            return True
+
+        return False
+
+    def record_success(self) -> None:
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.threshold:
+            self.state = CIRCUIT_OPEN
+            self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give up a probe that ended without a verdict, e.g. when it was cancelled."""
+        if self.state == CIRCUIT_HALF_OPEN:
+            self.state = CIRCUIT_OPEN
+
+
+class InControl2TokenBucket(object):
+    """Token bucket that adapts its rate to 429 responses."""
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        # asyncio.Lock wakes waiters in arrival order, so queued requests are served
+        # first come, first served. Devices issue their requests one at a time, which
+        # makes that a round robin across devices.
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                wait = self._blocked_until - now
+                if wait <= 0 and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep(max(wait, (1 - self._tokens) / self.rate))
+
+    def penalize(self, retry_after: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        self.rate = max(self.max_rate * RATE_LIMIT_MIN_FACTOR, self.rate / 2)
+        self._tokens = 0.0
+
+    def reward(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_LIMIT_RECOVERY)
+
+
+class InControl2RateLimiter(object):
+    """Paces API requests with one token bucket per org, or a single global one."""
+
+    def __init__(self, rate: float = DEFAULT_RATE_LIMIT, burst: int = DEFAULT_RATE_BURST,
+                 per_org: bool = False):
+        self._buckets = {}
+        self.throttled = 0
+        self.configure(rate, burst, per_org)
+
+    def configure(self, rate: float, burst: int = DEFAULT_RATE_BURST, per_org: bool = False) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.per_org = per_org
+        self._buckets = {}
+
+    def _bucket(self, command: str) -> InControl2TokenBucket:
+        segments = command.split('/')
+        key = segments[1] if self.per_org and len(segments) > 1 and segments[0] == 'o' else None
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = InControl2TokenBucket(self.rate, self.burst)
+
+        return bucket
+
+    async def acquire(self, command: str) -> None:
+        await self._bucket(command).acquire()
+
+    def penalize(self, command: str, retry_after: float) -> None:
+        self.throttled += 1
+        bucket = self._bucket(command)
+        bucket.penalize(retry_after)
+        _LOGGER.warning(f"Rate limited by InControl2, pausing {retry_after}s "
+                        f"and slowing to {bucket.rate:.2f} requests/s")
+
+    def reward(self, command: str) -> None:
+        self._bucket(command).reward()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'throttled': self.throttled,
+            'rates': {key or 'global': round(bucket.rate, 2) for key, bucket in self._buckets.items()},
+        }
+
+
+def parse_retry_after(value: str) -> float:
+    """Return the delay of a Retry-After header in seconds."""
+    if not value:
+        return DEFAULT_RETRY_AFTER
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+class InControl2EndpointStats(object):
+    """Request counters and latency histogram of one endpoint template."""
+    __slots__ = ('requests', 'cache_hits', 'statuses', 'bytes', 'retries', 'timeouts', 'errors',
+                 'latency_sum', 'latency_max', 'histogram')
+
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.statuses = {}
+        self.bytes = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record_latency(self, latency: float) -> None:
+        self.requests += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    @property
+    def latency_mean(self) -> float:
+        return self.latency_sum / self.requests if self.requests else None
+
+    def as_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'statuses': dict(self.statuses),
+            'bytes': self.bytes,
+            'retries': self.retries,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'latency_mean': round(self.latency_mean, 4) if self.requests else None,
+            'latency_max': round(self.latency_max, 4),
+            'histogram': {f'le_{bound}': count for bound, count in zip(LATENCY_BUCKETS + ('inf',), self.histogram)},
+        }
+
+
+class InControl2Metrics(object):
+    """Per-endpoint request instrumentation, keyed by endpoint template (e.g. o/*/g/*/d/*/loc)."""
+
+    def __init__(self):
+        self.endpoints = {}
+
+    def endpoint(self, template: str) -> InControl2EndpointStats:
+        stats = self.endpoints.get(template)
+        if stats is None:
+            stats = self.endpoints[template] = InControl2EndpointStats()
+
+        return stats
+
+    def record_response(self, template: str, status: int, latency: float, size: int) -> None:
+        stats = self.endpoint(template)
+        stats.record_latency(latency)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.bytes += size
+
+    def record_retry(self, template: str, _err: Exception = None) -> None:
+        self.endpoint(template).retries += 1
+
+    @property
+    def stats(self) -> dict:
+        return {template: stats.as_dict() for template, stats in self.endpoints.items()}
+
+
+# Device being refreshed by the current task, attached to trace spans
+_TRACE_DEVICE = contextvars.ContextVar('incontrol2_trace_device', default=None)
+_NO_SPAN = contextlib.nullcontext()
+
+
+class InControl2Tracer(object):
+    """Records spans of sampled poll cycles in Chrome trace event format.
+
+    Spans are only recorded between start_cycle() and end_cycle() of a sampled
+    cycle; otherwise span() returns a shared no-op context manager.
+    """
+
+    def __init__(self, sample_rate: float = 0):
+        self.sample_rate = sample_rate
+        self.last = None
+        self.slowest = None
+        self._active = False
+        self._events = []
+        self._started = 0.0
+
+    def start_cycle(self) -> None:
+        self._active = self.sample_rate > 0 and random.random() < self.sample_rate
+        self._events = []
+        self._started = time.perf_counter()
+
+    def end_cycle(self) -> None:
+        if not self._active:
+            return
+
+        self._active = False
+        trace = {
+            'duration': time.perf_counter() - self._started,
+            'started': datetime.now(timezone.utc).isoformat(),
+            'traceEvents': self._events,
+        }
+        self.last = trace
+        if self.slowest is None or trace['duration'] >= self.slowest['duration']:
+            self.slowest = trace
+
+    def span(self, name: str, device_id: int = None, **args):
+        """Return a context manager timing `name`, tagged with the device being refreshed."""
+        if not self._active:
+            return _NO_SPAN
+
+        return self._span(name, device_id if device_id is not None else _TRACE_DEVICE.get(), args)
+
+    @contextlib.contextmanager
+    def _span(self, name: str, device_id: int, args: dict) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if len(self._events) < TRACE_MAX_EVENTS:
+                self._events.append({
+                    'name': name,
+                    'ph': 'X',
+                    'ts': round((started - self._started) * 1e6),
+                    'dur': round((time.perf_counter() - started) * 1e6),
+                    'pid': 1,
+                    # One row per device in the trace viewer
+                    'tid': device_id or 0,
+                    'args': dict(args, device_id=device_id),
+                })
+
+    @staticmethod
+    def set_device(device_id: int) -> None:
+        """Tag spans of the current task with a device id."""
+        _TRACE_DEVICE.set(device_id)
+
+    def export(self, path: str, which: str = 'slowest') -> bool:
+        """Write the last or slowest traced cycle as a Chrome trace JSON file."""
+        trace = self.slowest if which == 'slowest' else self.last
+        if trace is None:
+            return False
+
+        with open(path, 'w') as trace_file:
+            json.dump(trace, trace_file)
+        if which == 'slowest':
+            self.slowest = None
+
+        return True
+
+
+class InControl2CacheEntry(object):
+    __slots__ = ('body', 'etag', 'last_modified', 'expires')
+
+    def __init__(self, body: bytes, etag: str, last_modified: str, expires: float):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+
+class InControl2ResponseCache(object):
+    """LRU cache of GET response bodies keyed by command and params."""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(command: str, params: dict) -> tuple:
+        return command, tuple(sorted((params or {}).items()))
+
+    def get(self, key: tuple) -> InControl2CacheEntry:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+
+        return entry
+
+    def put(self, key: tuple, body: bytes, etag: str, last_modified: str, ttl: int) -> None:
+        self._entries[key] = InControl2CacheEntry(body, etag, last_modified, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'evictions': self.evictions,
+        }
+
+
 class InControl2Connection(object):
     def __init__(self, oauth: InControl2OAuth, token_info: dict,
                  timeout: int = DEFAULT_TIMEOUT,
-                 websession=None):
-        """Initialize the InControl2 connection."""
-        if websession is None:
-            async def _create_session():
-                return aiohttp.ClientSession()
-
-            loop = asyncio.get_event_loop()
-            self.websession = loop.run_until_complete(_create_session())
-        else:
-            self.websession = websession
+                 websession=None,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 streaming: bool = False,
+                 api_endpoint: str = API_ENDPOINT):
+        """Initialize the InControl2 connection.
+
+        Without a websession, the connection creates (and must later close) its
+        own session on first use, with a pool sized to the concurrency level.
+        The API endpoint can be overridden, e.g. to point at a mock server.
+        """
+        self.websession = websession
+        self.api_endpoint = api_endpoint
+        self._owns_session = websession is None
+        self.closed = False
+        self._concurrency = concurrency
+        self._pool_stats = {
+            'connections_created': 0,
+            'connections_reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0,
+        }
+        self._in_flight = 0
         self._timeout = timeout
         self.oauth = oauth
         self.token_info = token_info
-        self._vehicles = []
-        self._orgs = []
+        # Bounds the number of in-flight API calls across all callers
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.request_count = 0
+        # Opt-in: pick needed fields out of large payloads instead of parsing them whole
+        self.streaming = streaming
+        # Keep the raw API dicts on the parsed models, e.g. for full entity attributes
+        self.keep_raw = False
+        # Skip location and interface requests for devices the listing reports offline
+        self.skip_offline = True
+        self.cache = InControl2ResponseCache()
+        self.rate_limiter = InControl2RateLimiter()
+        self.retry_policy = InControl2RetryPolicy()
+        self.breakers = {}
+        self.metrics = InControl2Metrics()
+        self.tracer = InControl2Tracer()
+        # Orgs and devices discovered through this connection, i.e. per config entry
+        self.orgs = []
+        self.devices = []
+        self.discovery_stats = {}
+        # Devices added and removed by the last discovery
+        self.discovery_changes = {'added': [], 'removed': []}
+
+    def _get_session(self) -> ClientSession:
+        if self.closed:
+            raise InControl2ConnectionClosed("Connection closed")
+
+        if self.websession is None:
+            connector = aiohttp.TCPConnector(limit=self._concurrency,
+                                             limit_per_host=self._concurrency,
+                                             ttl_dns_cache=DNS_CACHE_TTL,
+                                             keepalive_timeout=KEEPALIVE_TIMEOUT)
+            self.websession = aiohttp.ClientSession(connector=connector,
+                                                    trace_configs=[self._trace_config()])
+
+        return self.websession
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        def counter(name: str):
+            async def count(*_) -> None:
+                self._pool_stats[name] += 1
+
+            return count
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(counter('connections_created'))
+        trace_config.on_connection_reuseconn.append(counter('connections_reused'))
+        trace_config.on_dns_cache_hit.append(counter('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(counter('dns_cache_misses'))
+
+        return trace_config
+
+    @property
+    def pool_stats(self) -> dict:
+        """Return connection pool statistics for sessions owned by this connection."""
+        stats = dict(self._pool_stats, in_flight=self._in_flight, owns_session=self._owns_session)
+        if self.websession is not None and self._owns_session:
+            stats['limit_per_host'] = self.websession.connector.limit_per_host
+
+        return stats
+
+    async def close(self) -> None:
+        """Close the session if this connection created it and refuse further requests.
+
+        Requests still in flight fail instead of retrying, and a token refresh
+        in flight is cancelled.
+        """
+        self.closed = True
+        await self.oauth.close()
+        if self._owns_session and self.websession is not None:
+            await self.websession.close()
+            self.websession = None
+
+    async def set_concurrency(self, concurrency: int) -> None:
+        """Resize the cap on in-flight calls and, for an owned session, its connection pool.
+
+        The owned session is closed and recreated on the next request; calls still in
+        flight on it fail and are retried.
+        """
+        if concurrency == self._concurrency:
+            return
+
+        self._concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        if self._owns_session and self.websession is not None:
+            websession, self.websession = self.websession, None
+            await websession.close()
+
+    def clear(self) -> None:
+        """Drop the discovered orgs and devices, their entities and the cached responses."""
+        for device in self.devices:
+            for entity in list(device.entities):
+                device.remove_entity(entity)
+        self.devices.clear()
+        self.orgs = []
+        self.discovery_changes = {'added': [], 'removed': []}
+        self.cache.clear()
+        self.breakers.clear()
+
+    async def request(self, command: str, params: dict, retry: int = RETRY_ATTEMPTS - 1, get: bool = True,
+                      parser: Callable[[bytes], Any] = parse_json) -> Any:
+        """Request data and return the body as decoded by `parser`, retrying transient failures."""
+        breaker = self._breaker(command)
+        if breaker is not None and not breaker.allow():
+            raise InControl2CircuitOpen(f"Circuit open, skipping {command}")
 
-    async def request(self, command: str, params: dict, retry: int = 3, get: bool = True) -> str:
-        """Request data."""
+        try:
+            result = await self.retry_policy.call(self._request, command, params, get, parser,
+                                                  attempts=retry + 1, description=command,
+                                                  on_retry=functools.partial(self.metrics.record_retry,
+                                                                             endpoint_template(command)))
+        except RETRYABLE_ERRORS:
+            if breaker is not None:
+                breaker.record_failure()
+                if breaker.state == CIRCUIT_OPEN:
+                    _LOGGER.info(f"Circuit opened for {command} after {breaker.failures} failures")
+            raise
+        except BaseException:
+            if breaker is not None:
+                breaker.release()
+            raise
+
+        if breaker is not None:
+            breaker.record_success()
+
+        return result
+
+    def _breaker(self, command: str) -> InControl2CircuitBreaker:
+        """Return the circuit breaker of a device endpoint, or None for other commands."""
+        if not endpoint_template(command).startswith('o/*/g/*/d/*'):
+            return None
+
+        breaker = self.breakers.get(command)
+        if breaker is None:
+            breaker = self.breakers[command] = InControl2CircuitBreaker()
+
+        return breaker
+
+    def circuit_states(self, prefix: str) -> dict:
+        """Return the breaker states of the endpoints below a command prefix."""
+        return {command[len(prefix) + 1:] or 'device': breaker.state
+                for command, breaker in self.breakers.items()
+                if command == prefix or command.startswith(prefix + '/')}
+
+    async def _request(self, command: str, params: dict, get: bool,
+                       parser: Callable[[bytes], Any]) -> Any:
+        """Send a single request."""
+        if self.closed:
+            raise InControl2ConnectionClosed("Connection closed")
+
+        template = endpoint_template(command)
+        ttl = CACHE_TTLS.get(template) if get else None
+        cache_key = entry = None
+        if ttl is not None:
+            cache_key = self.cache.key(command, params)
+            entry = self.cache.get(cache_key)
+            if entry is not None and entry.expires > time.monotonic():
+                self.cache.hits += 1
+                self.metrics.endpoint(template).cache_hits += 1
+                return self._parse(parser, entry.body, template)
+            self.cache.misses += 1
 
         # Ensure token is valid
         try:
-            self.token_info = await self.oauth.refresh_access_token(self.token_info)
+            with self.tracer.span('token_refresh'):
+                self.token_info = await self.oauth.refresh_access_token(self.token_info)
         except InControl2OauthError as err:
             raise ConfigEntryAuthFailed(err) from err
+        self.oauth.refresh_in_background(self.token_info)
 
         headers = {
             "Accept": "application/json",
             'Authorization': 'Bearer ' + self.token_info.get('access_token')
         }
-
-        url = API_ENDPOINT + command
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        url = self.api_endpoint + command
+        with self.tracer.span('rate_limit', endpoint=template):
+            await self.rate_limiter.acquire(command)
+        self.request_count += 1
+        websession = self._get_session()
         try:
-            with async_timeout.timeout(self._timeout):
-                if get:
-                    resp = await self.websession.get(url, headers=headers, params=params)
-                else:
-                    resp = await self.websession.post(url, headers=headers, json=params)
-        except asyncio.TimeoutError:
-            if retry < 1:
-                msg = f"Timed out sending command to InControl2: {command}"
-                _LOGGER.error(msg)
-                raise InControl2Timeout(msg)
-            return await self.request(command, params, retry - 1, get)
-        except aiohttp.ClientError:
-            msg = f"Error sending command to InControl2: {command}"
-            _LOGGER.error(msg, exc_info=True)
-            raise InControl2ClientError(msg)
+            async with self._semaphore:
+                self._in_flight += 1
+                started = time.perf_counter()
+                try:
+                    async with asyncio.timeout(self._timeout):
+                        with self.tracer.span('http', endpoint=template):
+                            if get:
+                                resp = await websession.get(url, headers=headers, params=params)
+                            else:
+                                resp = await websession.post(url, headers=headers, json=params)
+                            body = await resp.read()
+                finally:
+                    self._in_flight -= 1
+        except asyncio.TimeoutError as err:
+            self.metrics.endpoint(template).timeouts += 1
+            raise InControl2Timeout(f"Timed out sending command to InControl2: {command}") from err
+        except aiohttp.ClientError as err:
+            self.metrics.endpoint(template).errors += 1
+            raise InControl2ClientError(f"Error sending command to InControl2: {command}: {err}") from err
+
+        self.metrics.record_response(template, resp.status, time.perf_counter() - started, len(body))
+
+        if resp.status == 429:
+            # The limiter holds back further requests until Retry-After has passed
+            self.rate_limiter.penalize(command, parse_retry_after(resp.headers.get('Retry-After')))
+            raise InControl2RateLimited(f"Rate limited by InControl2: {command}")
+
+        self.rate_limiter.reward(command)
+
+        if resp.status == 304 and entry is not None:
+            self.cache.revalidated += 1
+            entry.expires = time.monotonic() + ttl
+            return self._parse(parser, entry.body, template)
+
+        if resp.status >= 500:
+            _LOGGER.debug(body.decode('utf-8', errors='replace'))
+            raise InControl2ServerError(f"InControl2 returned {resp.status}: {command}")
 
         if resp.status != 200:
-            _LOGGER.error(await resp.text())
-            raise InControl2UnknownError()
+            _LOGGER.error(body.decode('utf-8', errors='replace'))
+            raise InControl2UnknownError(f"InControl2 returned {resp.status}: {command}")
+
+        if cache_key is not None:
+            etag = resp.headers.get('ETag')
+            last_modified = resp.headers.get('Last-Modified')
+            # Without validators a zero TTL entry could never be reused
+            if ttl or etag or last_modified:
+                self.cache.put(cache_key, body, etag, last_modified, ttl)
+
+        return self._parse(parser, body, template)
 
-        return await resp.text()
+    def _parse(self, parser: Callable[[bytes], Any], body: bytes, template: str) -> Any:
+        with self.tracer.span('parse', endpoint=template, bytes=len(body)):
+            return parser(body)
+
+
+def endpoint_template(command: str) -> str:
+    """Return the command with org, group and device ids replaced by '*'."""
+    segments = command.split('/')
+    return '/'.join('*' if index and segments[index - 1] in ('o', 'g', 'd') else segment
+                    for index, segment in enumerate(segments))
 
 
 def is_token_expired(token_info: dict) -> int:
     """Check if token is expired."""
-    return token_info['expires_at'] - int(time.time()) < 60*60
+    return token_info['expires_at'] - int(time.time()) < TOKEN_EXPIRY_MARGIN
+
+
+def is_token_expiring(token_info: dict) -> bool:
+    """Check if token should be refreshed ahead of expiry."""
+    refresh_ahead = max(TOKEN_EXPIRY_MARGIN, token_info.get('expires_in', 0) * TOKEN_REFRESH_AHEAD_RATIO)
+    return token_info['expires_at'] - int(time.time()) < refresh_ahead
+
+
+class InControl2RequestBudget(object):
+    """Hourly API request allowance shared by all poll cycles."""
+
+    def __init__(self, requests_per_hour: int = DEFAULT_REQUEST_BUDGET):
+        self.requests_per_hour = requests_per_hour
+        # Unused allowance is capped so an idle period cannot turn into a burst
+        self._capacity = requests_per_hour / 6
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+
+    def available(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(self._capacity,
+                           self._tokens + (now - self._updated) * self.requests_per_hour / 3600)
+        self._updated = now
+
+        return self._tokens
+
+    def spend(self, requests: int) -> None:
+        self.available()
+        self._tokens -= requests
 
 
 class InControl2Device:
     """Instance of InControl2 vehicle."""
-    _devices = []
 
     @classmethod
-    def add_device(cls, device):
-        cls._devices.append(device)
+    def get_devices(cls, session: InControl2Connection) -> List['InControl2Device']:
+        """Return the devices registered on a connection."""
+        return session.devices
 
     @classmethod
-    def get_devices(cls):
-        return cls._devices
+    def find_device(cls, session: InControl2Connection, org_id: str, group_id: int, device_id: int):
+        """Return the known device with the given ids, or None."""
+        return next((device for device in session.devices
+                     if (device.org_id, device.group_id, device.device_id) == (org_id, group_id, device_id)), None)
 
     @classmethod
-    async def update_all(cls) -> None:
-        for device in cls.get_devices():
-            if not await device.update():
-                _LOGGER.warning(f"Update failed for {device.name} ({device.device_id}). "
-                                f"Likely throttled (min_interval: {MIN_TIME_BETWEEN_UPDATES})")
+    async def update_all(cls, session: InControl2Connection,
+                         concurrency: int = DEFAULT_CONCURRENCY,
+                         device_timeout: int = DEFAULT_DEVICE_TIMEOUT,
+                         scan_interval: int = DEFAULT_SCAN_INTERVAL,
+                         budget: 'InControl2RequestBudget' = None) -> dict:
+        """Update all devices of a connection that are due concurrently and return a result per device id."""
+        request_count = session.request_count
+        selected = cls._select_due_devices(session, budget)
+        if not selected:
+            return {}
+
+        semaphore = asyncio.Semaphore(concurrency)
+        groups = [group for org in InControl2Org.get_orgs(session) for group in org.get_groups()
+                  if any(device in selected for device in group.get_devices())]
+        with session.tracer.span('update_all', devices=len(selected)):
+            results = await asyncio.gather(*(group.update(semaphore, device_timeout, scan_interval, selected)
+                                             for group in groups),
+                                           return_exceptions=True)
+
+        if budget is not None:
+            budget.spend(session.request_count - request_count)
+
+        summary = {}
+        errors = []
+        for group, result in zip(groups, results):
+            if isinstance(result, ConfigEntryAuthFailed):
+                raise result
+            if isinstance(result, Exception):
+                _LOGGER.warning(f"Update failed for group {group.name} ({group.group_id}): {result}")
+                errors.append(result)
+                summary.update({device.device_id: UPDATE_ERROR for device in group.get_devices()
+                                if device in selected})
+                continue
+            summary.update(result)
+
+        failed = {device_id: result for device_id, result in summary.items()
+                  if result not in (UPDATE_OK, UPDATE_SKIPPED)}
+        if failed:
+            _LOGGER.warning(f"{len(failed)} of {len(summary)} devices failed to update: {failed}")
+
+        if errors and len(failed) == len(summary):
+            raise errors[0]
+
+        return summary
+
+    @classmethod
+    def has_due_devices(cls, session: InControl2Connection) -> bool:
+        """Return whether any device of a connection is due for a poll."""
+        now = time.monotonic()
+        return any(device.next_poll <= now for device in session.devices)
+
+    @classmethod
+    def schedule_all_now(cls, session: InControl2Connection) -> None:
+        """Make every device of a connection due, the most overdue still first; the request budget still applies."""
+        now = time.monotonic()
+        for device in session.devices:
+            device._next_poll = min(device.next_poll, now)
+
+    @classmethod
+    def _select_due_devices(cls, session: InControl2Connection, budget: 'InControl2RequestBudget' = None) -> list:
+        """Pick the due devices, most overdue first, that fit in the request budget."""
+        now = time.monotonic()
+        due = sorted((device for device in session.devices if device.next_poll <= now),
+                     key=lambda device: device.next_poll)
+        if budget is None:
+            return due
+
+        available = budget.available()
+        groups = set()
+        selected = []
+        for device in due:
+            cost = device.request_cost + (0 if device.group_id in groups else 1)
+            if cost > available:
+                break
+            available -= cost
+            groups.add(device.group_id)
+            selected.append(device)
+
+        if len(selected) < len(due):
+            _LOGGER.info(f"Request budget exhausted, deferring {len(due) - len(selected)} devices")
+
+        return selected
 
     def __init__(self, device_id: int, data: dict, org_id: str, group_id: int, session: InControl2Connection):
         """Initialize the Ambiclimate device class."""
         self._device_id = device_id
-        self._data = data
+        self._data = InControl2DeviceStatus.from_api(data, session.keep_raw)
         self._org_id = org_id
         self._group_id = group_id
         self.session = session
 
-        self._location = {}
-        self._wans = {}
+        self._location = None
+        self._location_stale = False
+        self._location_cursor = None
+        self._fixes = deque(maxlen=LOCATION_HISTORY_SIZE)
+        self._wans = []
+        self._wans_stale = False
+        self._wan_index = {}
+        # WAN ids that entities were created for, see wan_changes()
+        self._announced_wans = set()
+        self._wans_changed_at = None
+        self._circuits = {}
+        self._next_poll = 0
+        self._changes = set()
         self._entities = []
 
-        InControl2Device.add_device(self)
+        session.devices.append(self)
 
     def add_entity(self, entity: object) -> None:
         self._entities.append(entity)
 
-    @Throttle(MIN_TIME_BETWEEN_UPDATES)
-    async def update(self) -> bool:
-        _LOGGER.info(f'Updating device, {self.name} ({self.device_id})')
-        self._data = await self._update_device()
-        self._location = await self._update_location()
-        self._wans = await self._update_wans()
+    def remove_entity(self, entity: object) -> None:
+        if entity in self._entities:
+            self._entities.remove(entity)
 
-        for entity in self.entities:
-            if not entity.enabled:
-                continue
+    def wan_changes(self) -> tuple:
+        """Return the WANs added and the WAN ids removed since the last call."""
+        wan_ids = set(self._wan_index)
+        added = [wan for wan in self._wans if wan.id not in self._announced_wans]
+        removed = self._announced_wans - wan_ids
+        self._announced_wans = wan_ids
 
-            entity.async_schedule_update_ha_state()
+        return added, removed
+
+    def snapshot(self) -> dict:
+        """Return the last known state of the device for a startup snapshot."""
+        return {
+            'id': self._device_id,
+            'data': self._data.as_dict(),
+            'location': self._location.as_dict() if self._location is not None else None,
+            'location_cursor': self._location_cursor,
+            'wans': [wan.as_dict() for wan in self._wans],
+        }
+
+    def restore(self, snapshot: dict) -> None:
+        """Restore the last known state saved by snapshot()."""
+        self._data = InControl2DeviceStatus.from_dict(snapshot['data'])
+        if snapshot.get('location') is not None:
+            self._location = InControl2LocationFix.from_dict(snapshot['location'])
+            self._fixes.append(self._location)
+        self._location_cursor = snapshot.get('location_cursor')
+        self._wans = [InControl2WanInterface.from_dict(wan) for wan in snapshot.get('wans', [])]
+        self._wan_index = {wan.id: wan for wan in self._wans}
+
+    async def refresh(self, record: dict = None) -> bool:
+        """Refresh the device, reusing a record from the group listing when given."""
+        _LOGGER.info(f'Updating device, {self.name} ({self.device_id})')
+        self.session.tracer.set_device(self._device_id)
+        wans = None
+        if record is None:
+            record = await self._update_device()
+        with self.session.tracer.span('build_models'):
+            if record.get('interfaces') is not None:
+                wans = [InControl2WanInterface.from_api(wan, self.session.keep_raw) for wan in record['interfaces']]
+            data = InControl2DeviceStatus.from_api(record, self.session.keep_raw)
+        self._set_changed(CHANGED_DATA, data != self._data)
+        self._set_changed(CHANGED_STATUS, data.identity != self._data.identity)
+        self._data = data
+
+        # Offline devices report no new fixes or interface states; keep the last known ones, marked stale
+        skip = self.session.skip_offline and data.status != 'online'
+        self._location_stale = skip
+        if not skip:
+            # Keep the last known fix when no new points were reported, or the endpoint's circuit is open
+            try:
+                location = await self._update_location() or self._location
+            except InControl2CircuitOpen:
+                location = self._location
+            self._set_changed(CHANGED_LOCATION, location != self._location)
+            self._location = location
+
+        self._wans_stale = wans is None and skip
+        if self._wans_stale:
+            return True
+
+        if wans is None:
+            try:
+                wans = await self._update_wans()
+            except InControl2CircuitOpen:
+                wans = None
+        if not wans:
+            # A failed or empty listing keeps the known WANs, so wan_changes() reports none removed
+            wans = self._wans
+        wan_index = {wan.id: wan for wan in wans}
+        for wan_id, wan in wan_index.items():
+            self._set_changed(('wan', wan_id), self._wan_index.get(wan_id) != wan)
+
+        if self._wans and self._wan_states(self._wans) != self._wan_states(wans):
+            self._wans_changed_at = time.monotonic()
+        self._wans = wans
+        self._wan_index = wan_index
 
         return True
 
+    def track_circuits(self) -> None:
+        """Record whether the circuit breaker states changed, whatever the outcome of the refresh."""
+        circuits = self.circuit_states
+        self._set_changed(CHANGED_CIRCUITS, circuits != self._circuits)
+        self._circuits = circuits
+
+    def _set_changed(self, key, changed: bool) -> None:
+        if changed:
+            self._changes.add(key)
+
+    def clear_changes(self) -> None:
+        """Forget the recorded changes, once the entities were notified of them."""
+        self._changes.clear()
+
+    def has_changed(self, *keys) -> bool:
+        """Return whether any of the given inputs changed since the entities were last notified."""
+        return any(key in self._changes for key in keys)
+
+    def snapshot_changed(self) -> bool:
+        """Return whether what snapshot() saves changed since the entities were last notified, except the counters."""
+        return self.has_changed(CHANGED_STATUS, CHANGED_LOCATION, *(('wan', wan.id) for wan in self._wans))
+
+    @staticmethod
+    def _wan_states(wans: list) -> dict:
+        return {wan.id: wan.status for wan in wans}
+
+    def poll_interval(self, scan_interval: int = DEFAULT_SCAN_INTERVAL) -> int:
+        """Return the seconds until this device should be polled again."""
+        if self.state != 'online':
+            return scan_interval * OFFLINE_BACKOFF
+
+        if self._location is not None and (self._location.speed or 0) > MOVING_SPEED:
+            return min(POLL_INTERVAL_MIN, scan_interval)
+
+        if self._wans_changed_at is not None and time.monotonic() - self._wans_changed_at < WAN_FLAP_WINDOW:
+            return min(POLL_INTERVAL_MIN, scan_interval)
+
+        return scan_interval
+
+    @property
+    def request_cost(self) -> int:
+        """Return the estimated requests of the next refresh, besides the group listing."""
+        if self.session.skip_offline and self.state != 'online':
+            return 0
+
+        return DEVICE_REQUEST_COST
+
+    def schedule_next_poll(self, scan_interval: int = DEFAULT_SCAN_INTERVAL) -> None:
+        self._next_poll = time.monotonic() + self.poll_interval(scan_interval)
+
+    @property
+    def next_poll(self) -> float:
+        """Return the monotonic time the device is next due for a poll."""
+        return self._next_poll
+
     async def _update_device(self) -> dict:
         res = await self.session.request(f'o/{self._org_id}/g/{self._group_id}/d/{self._device_id}', {})
         if not res:
             return {}
-        res = json.loads(res)
         return res.get('data', {})
 
-    @retry(times=3, backoff=10, return_value={})
-    async def _update_location(self) -> dict:
+    @retry(retry_on=(InControl2NoLocationFound,), return_value=None)
+    async def _update_location(self) -> InControl2LocationFix:
         url = f'o/{self._org_id}/g/{self._group_id}/d/{self._device_id}/loc'
-        res = await self.session.request(url, {})
+        # Only ask for points newer than the last one seen
+        params = {} if self._location_cursor is None else {'start': self._location_cursor}
+        parser = parse_array_tail(LOCATION_HISTORY_SIZE, self._is_new_fix) if self.session.streaming else parse_json
+        res = await self.session.request(url, params, parser=parser)
         if not res:
             raise InControl2NoLocationFound()
 
-        res = json.loads(res)
-        locations = res.get('data', [])
+        # The cursor point itself is returned again by an inclusive start; points without a
+        # timestamp are skipped, so every remaining point can move the cursor
+        locations = [location for location in res.get('data', []) if self._is_new_fix(location)]
 
         if not bool(locations):
-            return {}
+            return self._location
 
-        location = locations[-1]
+        with self.session.tracer.span('build_models', endpoint='loc'):
+            for location in locations[-LOCATION_HISTORY_SIZE:]:
+                self._fixes.append(InControl2LocationFix.from_api(location))
+            self._location_cursor = locations[-1]['ts']
 
-        return {
-            'latitude': location.get('la'),
-            'longitude': location.get('lo'),
-            'altitude': location.get('at'),
-            'speed': location.get('sp'),
-            'timestamp': location.get('ts'),
-        }
+            return replace(self._fixes[-1], heading=self._heading())
+
+    def _is_new_fix(self, location: dict) -> bool:
+        timestamp = location.get('ts')
+        if timestamp is None:
+            return False
 
-    @retry(times=3, backoff=10, return_value=[])
-    async def _update_wans(self) -> list:
-        res = await self.session.request(f'o/{self._org_id}/g/{self._group_id}/d/{self._device_id}/info/interfaces', {})
+        return self._location_cursor is None or timestamp > self._location_cursor
+
+    def _heading(self):
+        """Return the bearing in degrees between the two most recent distinct fixes."""
+        current = self._fixes[-1]
+        previous = next((fix for fix in reversed(self._fixes)
+                         if (fix.latitude, fix.longitude) != (current.latitude, current.longitude)), None)
+        if previous is None or None in (previous.latitude, previous.longitude, current.latitude, current.longitude):
+            return None
+
+        lat1 = math.radians(previous.latitude)
+        lat2 = math.radians(current.latitude)
+        delta = math.radians(current.longitude - previous.longitude)
+        x = math.sin(delta) * math.cos(lat2)
+        y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(delta)
+
+        return round((math.degrees(math.atan2(x, y)) + 360) % 360, 1)
+
+    @retry(retry_on=(InControl2NoWANsFound,), return_value=None)
+    async def _update_wans(self) -> List[InControl2WanInterface]:
+        parser = parse_array_fields(WAN_FIELDS) if self.session.streaming else parse_json
+        res = await self.session.request(f'o/{self._org_id}/g/{self._group_id}/d/{self._device_id}/info/interfaces', {},
+                                         parser=parser)
         if not res:
             raise InControl2NoWANsFound()
 
-        res = json.loads(res)
-        res = res.get('data', [])
-
-        return res
+        with self.session.tracer.span('build_models', endpoint='interfaces'):
+            return [InControl2WanInterface.from_api(wan, self.session.keep_raw) for wan in res.get('data', [])]
 
     @property
     def device_id(self) -> int:
@@ -323,24 +1621,48 @@ class InControl2Device:
     @property
     def name(self) -> str:
         """Return a device name."""
-        return self._data.get('name')
+        return self._data.name
 
     @property
-    def location(self) -> dict:
-        """Return a device name."""
+    def location(self) -> InControl2LocationFix:
+        """Return the most recent location fix, or None."""
         return self._location
 
     @property
-    def wans(self) -> dict:
-        """Return a device name."""
+    def location_stale(self) -> bool:
+        """Return whether the location was not refreshed because the device is offline."""
+        return self._location_stale
+
+    @property
+    def fixes(self) -> List[InControl2LocationFix]:
+        """Return the most recent location fixes, oldest first."""
+        return list(self._fixes)
+
+    @property
+    def wans(self) -> List[InControl2WanInterface]:
+        """Return the device's WAN interfaces."""
         return self._wans
 
+    @property
+    def wans_stale(self) -> bool:
+        """Return whether the WAN interfaces were not refreshed because the device is offline."""
+        return self._wans_stale
+
+    @property
+    def circuit_states(self) -> dict:
+        """Return the circuit breaker state of each endpoint of this device."""
+        return self.session.circuit_states(f'o/{self._org_id}/g/{self._group_id}/d/{self._device_id}')
+
+    def get_wan(self, wan_id: int) -> InControl2WanInterface:
+        """Return the WAN interface with the given id, or None."""
+        return self._wan_index.get(wan_id)
+
     @property
     def group_id(self) -> int:
         return self._group_id
 
     @property
-    def data(self) -> dict:
+    def data(self) -> InControl2DeviceStatus:
         return self._data
 
     @property
@@ -356,7 +1678,7 @@ class InControl2Device:
     @property
     def state(self):
         """Return a device name."""
-        return self._data.get("status")
+        return self._data.status
 
 
 class InControl2Group:
@@ -369,53 +1691,225 @@ class InControl2Group:
         self.session = session
         self._devices = []
 
-    async def find_devices(self) -> bool:
-        res = await self.session.request(f'o/{self._org_id}/g/{self._group_id}/d', {})
-        if not res:
+    async def find_devices(self, previous: 'InControl2Group' = None) -> bool:
+        """Find the devices in the group, keeping those of the previous discovery without a listing."""
+        records = await self._fetch_devices()
+        if not records:
+            # An empty or failed listing must not remove every device (and entity) of the group
+            self.keep_devices(previous)
             return False
-        res = json.loads(res)
-        devices = []
 
-        for device in res.get('data', []):
-            device_instance = InControl2Device(device.get('id'),
-                                               device,
-                                               self._org_id,
-                                               self._group_id,
-                                               self.session)
-            await device_instance.update()
-            devices.append(device_instance)
+        # Devices restored from a snapshot (or found before) are kept, so their entities stay bound.
+        # Only new devices and devices whose status changed are refreshed, the rest is left to polling.
+        devices = []
+        stale = []
+        for device_id, record in records.items():
+            device = InControl2Device.find_device(self.session, self._org_id, self._group_id, device_id)
+            if device is None:
+                device = InControl2Device(device_id, record, self._org_id, self._group_id, self.session)
+                stale.append(device)
+            elif device.state != record.get('status'):
+                stale.append(device)
+            devices.append(device)
 
         self._devices = devices
+        if stale:
+            await self._refresh_devices(records, devices=stale)
 
         return bool(self._devices)
 
+    async def update(self, semaphore: asyncio.Semaphore = None,
+                     device_timeout: int = DEFAULT_DEVICE_TIMEOUT,
+                     scan_interval: int = DEFAULT_SCAN_INTERVAL,
+                     devices: List[InControl2Device] = None) -> dict:
+        """Refresh the given (default all) devices in the group from a single device listing."""
+        request_count = self.session.request_count
+        selected = [device for device in self._devices if devices is None or device in devices]
+        # Without a listing no device is refreshed; back them off like a failed refresh so they
+        # are not polled again on every tick
+        try:
+            records = await self._fetch_devices()
+        except Exception:
+            for device in selected:
+                device.schedule_next_poll(scan_interval)
+            raise
+
+        if not records:
+            _LOGGER.warning(f"Empty device listing for group {self._name} ({self._group_id})")
+            for device in selected:
+                device.schedule_next_poll(scan_interval)
+            return {device.device_id: UPDATE_ERROR for device in selected}
+
+        results = await self._refresh_devices(records, semaphore, device_timeout, scan_interval, devices)
+        _LOGGER.debug(f"Updated {len(results)} devices in group {self._name} "
+                      f"using {self.session.request_count - request_count} requests")
+
+        return results
+
+    async def _fetch_devices(self) -> dict:
+        res = await self.session.request(f'o/{self._org_id}/g/{self._group_id}/d', GROUP_DEVICE_PARAMS)
+        if not res:
+            return {}
+
+        return {device.get('id'): device for device in res.get('data', [])}
+
+    async def _refresh_devices(self, records: dict, semaphore: asyncio.Semaphore = None,
+                               device_timeout: int = DEFAULT_DEVICE_TIMEOUT,
+                               scan_interval: int = DEFAULT_SCAN_INTERVAL,
+                               devices: List[InControl2Device] = None) -> dict:
+        devices = [device for device in self._devices if devices is None or device in devices]
+        # Devices missing from the listing fall back to a full per-device refresh.
+        results = await asyncio.gather(*(
+            self._refresh_device(device, records.get(device.device_id), semaphore, device_timeout, scan_interval)
+            for device in devices
+        ))
+
+        return {device.device_id: result for device, result in zip(devices, results)}
+
+    @staticmethod
+    async def _refresh_device(device: InControl2Device, record: dict, semaphore: asyncio.Semaphore,
+                              device_timeout: int, scan_interval: int) -> str:
+        # The deadline only starts once the device holds a slot in the semaphore
+        async with semaphore or contextlib.nullcontext():
+            try:
+                with device.session.tracer.span('refresh', device_id=device.device_id):
+                    await asyncio.wait_for(device.refresh(record), device_timeout)
+            except asyncio.TimeoutError:
+                _LOGGER.warning(f"Update of {device.name} ({device.device_id}) "
+                                f"exceeded its {device_timeout}s deadline")
+                return UPDATE_TIMEOUT
+            except InControl2CircuitOpen as err:
+                _LOGGER.debug(f"Skipped update of {device.name} ({device.device_id}): {err}")
+                return UPDATE_SKIPPED
+            except (InControl2Timeout, InControl2ClientError, InControl2UnknownError) as err:
+                _LOGGER.warning(f"Update failed for {device.name} ({device.device_id}): {err!r}")
+                return UPDATE_ERROR
+            finally:
+                device.track_circuits()
+                device.schedule_next_poll(scan_interval)
+
+        return UPDATE_OK
+
+    @property
+    def group_id(self) -> int:
+        return self._group_id
+
+    @property
+    def name(self) -> str:
+        return self._name
+
     def get_devices(self) -> List[InControl2Device]:
         return self._devices
 
+    def keep_devices(self, previous: 'InControl2Group') -> None:
+        """Take over the devices of the same group from the previous discovery, if any."""
+        self._devices = list(previous.get_devices()) if previous is not None else []
+
+    def snapshot(self) -> dict:
+        return {
+            'id': self._group_id,
+            'name': self._name,
+            'devices': [device.snapshot() for device in self._devices],
+        }
+
+    def restore(self, snapshot: dict) -> None:
+        for device_snapshot in snapshot.get('devices', []):
+            device = InControl2Device(device_snapshot['id'], {}, self._org_id, self._group_id, self.session)
+            device.restore(device_snapshot)
+            self._devices.append(device)
+
 
 class InControl2Org:
-    _orgs = []
+
+    @classmethod
+    def get_orgs(cls, session: InControl2Connection) -> List['InControl2Org']:
+        """Return the orgs discovered on a connection."""
+        return session.orgs
 
     @classmethod
     async def find_orgs(cls, session: InControl2Connection) -> bool:
         """Get users InControl2 vehicle information."""
-        res = await session.request('o', {})
-        if not res:
-            return False
+        started = time.monotonic()
+        request_count = session.request_count
+        known = list(session.devices)
+        previous = {org.org_id: org for org in session.orgs}
+
+        try:
+            res = await session.request('o', {})
+            if not res:
+                return False
+
+            orgs = [InControl2Org(org.get('id'),
+                                  org.get('name'),
+                                  org.get('status'),
+                                  session)
+                    for org in res.get('data', [])]
+
+            # A failing org keeps its groups and devices from the previous discovery
+            results = await asyncio.gather(*(org.find_groups(previous.get(org.org_id)) for org in orgs),
+                                           return_exceptions=True)
+            for org, result in zip(orgs, results):
+                if isinstance(result, (ConfigEntryAuthFailed, asyncio.CancelledError)):
+                    raise result
+                if isinstance(result, Exception):
+                    _LOGGER.warning(f"Discovery failed for org {org.name} ({org.org_id}): {result!r}")
+                    org.keep_groups(previous.get(org.org_id))
+        except BaseException:
+            # Devices created by an aborted discovery belong to no group
+            session.devices[:] = known
+            raise
+
+        session.orgs = orgs
+        found = [device for org in orgs for group in org.get_groups() for device in group.get_devices()]
+        removed = [device for device in known if device not in found]
+        # Also drops devices created for groups whose discovery failed
+        session.devices[:] = found
+        session.discovery_changes = {
+            'added': [device for device in found if device not in known],
+            'removed': removed,
+        }
+        session.discovery_stats = {
+            'duration': round(time.monotonic() - started, 3),
+            'requests': session.request_count - request_count,
+            'orgs': len(orgs),
+            'groups': sum(len(org.get_groups()) for org in orgs),
+            'devices': len(found),
+            'added': len(session.discovery_changes['added']),
+            'removed': len(removed),
+        }
+        _LOGGER.info(f"Discovery finished in {session.discovery_stats['duration']}s "
+                     f"using {session.discovery_stats['requests']} requests: {session.discovery_stats}")
+
+        return bool(session.orgs)
+
+    @classmethod
+    def snapshot_all(cls, session: InControl2Connection) -> dict:
+        """Return the discovered topology and last known device state."""
+        return {'orgs': [org.snapshot() for org in session.orgs]}
 
-        res = json.loads(res)
+    @classmethod
+    def restore_all(cls, snapshot: dict, session: InControl2Connection) -> bool:
+        """Rebuild orgs, groups and devices from a snapshot without any API request."""
+        known = list(session.devices)
         orgs = []
-        for org in res.get('data', []):
-            org_instance = InControl2Org(org.get('id'),
-                                         org.get('name'),
-                                         org.get('status'),
-                                         session)
-            await org_instance.find_groups()
-            orgs.append(org_instance)
+        try:
+            for org_snapshot in snapshot.get('orgs', []):
+                org = InControl2Org(org_snapshot['id'], org_snapshot['name'], org_snapshot.get('status'), session)
+                for group_snapshot in org_snapshot.get('groups', []):
+                    group = InControl2Group(group_snapshot['id'], group_snapshot['name'], {},
+                                            org_snapshot['id'], session)
+                    group.restore(group_snapshot)
+                    org._groups.append(group)
+                orgs.append(org)
+        except (KeyError, TypeError, ValueError) as err:
+            _LOGGER.warning(f"Ignoring invalid device snapshot: {err!r}")
+            session.devices[:] = known
+            return False
 
-        cls._orgs = orgs
+        session.orgs = orgs
+        _LOGGER.info(f"Restored {len(session.devices)} devices from snapshot")
 
-        return bool(cls._orgs)
+        return bool(session.orgs)
 
     def __init__(self, org_id: str, name: str, status: str, session: InControl2Connection):
         self._org_id = org_id
@@ -426,26 +1920,54 @@ class InControl2Org:
 
         _LOGGER.info(f'Found org {name}')
 
-    async def find_groups(self) -> bool:
+    async def find_groups(self, previous: 'InControl2Org' = None) -> bool:
+        """Find the groups of the org, keeping those of the previous discovery without a listing."""
         res = await self.session.request('o/{org_id}/g'.format(org_id=self._org_id), {})
         if not res:
+            self.keep_groups(previous)
             return False
-        res = json.loads(res)
-        groups = []
-
-        for group in res.get('data', []):
-            group_instance = InControl2Group(group.get('id'),
-                                             group.get('name'),
-                                             group,
-                                             self._org_id,
-                                             self.session)
-            await group_instance.find_devices()
-            groups.append(group_instance)
+        groups = [InControl2Group(group.get('id'),
+                                  group.get('name'),
+                                  group,
+                                  self._org_id,
+                                  self.session)
+                  for group in res.get('data', [])]
+
+        # A failing group keeps its devices from the previous discovery
+        previous_groups = {group.group_id: group for group in previous.get_groups()} if previous is not None else {}
+        results = await asyncio.gather(*(group.find_devices(previous_groups.get(group.group_id)) for group in groups),
+                                       return_exceptions=True)
+        for group, result in zip(groups, results):
+            if isinstance(result, (ConfigEntryAuthFailed, asyncio.CancelledError)):
+                raise result
+            if isinstance(result, Exception):
+                _LOGGER.warning(f"Discovery failed for group {group.name} ({group.group_id}): {result!r}")
+                group.keep_devices(previous_groups.get(group.group_id))
 
         self._groups = groups
 
         return bool(self._groups)
 
+    def keep_groups(self, previous: 'InControl2Org') -> None:
+        """Take over the groups of the same org from the previous discovery, if any."""
+        self._groups = list(previous.get_groups()) if previous is not None else []
+
+    @property
+    def org_id(self) -> str:
+        return self._org_id
+
+    @property
+    def name(self) -> str:
+        return self._name
+
     def get_groups(self) -> List[InControl2Group]:
         """Get orgs InControl2 groups."""
         return self._groups
+
+    def snapshot(self) -> dict:
+        return {
+            'id': self._org_id,
+            'name': self._name,
+            'status': self._status,
+            'groups': [group.snapshot() for group in self._groups],
+        }
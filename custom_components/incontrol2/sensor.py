@@ -3,61 +3,92 @@
 import logging
 from typing import Callable
 
-from .incontrol2 import InControl2Device
-from homeassistant.core import HomeAssistant
+from .incontrol2 import CHANGED_STATUS, InControl2Device
+from .coordinator import InControl2Coordinator
+from .entity import InControl2Entity
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.helpers.entity import Entity
-from homeassistant.components.sensor import SensorEntity, SensorDeviceClass
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.helpers.device_registry import DeviceEntryType
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.components.sensor import SensorEntity, SensorDeviceClass, SensorStateClass
 
 from .const import (
     DOMAIN,
     PEPLINK,
+    SIGNAL_NEW_DEVICES,
+    SIGNAL_NEW_WANS,
     SIGNAL_UNITS,
     IncontrolIcons
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# Endpoint templates that get a diagnostic latency sensor
+API_ENDPOINT_SENSORS = {
+    'Device Listing': 'o/*/g/*/d',
+    'Device': 'o/*/g/*/d/*',
+    'Location': 'o/*/g/*/d/*/loc',
+    'Interfaces': 'o/*/g/*/d/*/info/interfaces',
+}
 
-async def async_setup_entry(_hass: HomeAssistant,
-                            _entry: ConfigEntry,
+
+async def async_setup_entry(hass: HomeAssistant,
+                            entry: ConfigEntry,
                             async_add_entities: Callable[[list, bool], None]):
-    devs = []
-    for device in InControl2Device.get_devices():
+    coordinator = entry.runtime_data
+
+    def wan_entities(device: InControl2Device, wans: list) -> list:
+        return [InControl2Wan(coordinator, wan.id, wan, device, {}) for wan in wans if wan.type != "ethernet"]
 
-        for wan in device.wans:
-            if wan.get("type") == "ethernet":
-                continue
+    @callback
+    def add_devices(devices: list) -> None:
+        async_add_entities([entity for device in devices for entity in wan_entities(device, device.wans)])
 
-            devs.append(InControl2Wan(wan["id"], wan, device, {}))
+    @callback
+    def add_wans(device: InControl2Device, wans: list) -> None:
+        async_add_entities(wan_entities(device, wans))
 
-    async_add_entities(devs, True)
+    add_devices(InControl2Device.get_devices(coordinator.connection))
+    entry.async_on_unload(async_dispatcher_connect(hass, SIGNAL_NEW_DEVICES.format(entry.entry_id), add_devices))
+    entry.async_on_unload(async_dispatcher_connect(hass, SIGNAL_NEW_WANS.format(entry.entry_id), add_wans))
 
+    api_sensors = [InControl2ApiRequests(coordinator, entry.entry_id)]
+    api_sensors.extend(InControl2ApiLatency(coordinator, entry.entry_id, name, template)
+                       for name, template in API_ENDPOINT_SENSORS.items())
+    async_add_entities(api_sensors)
 
-class InControl2Wan(SensorEntity):
 
-    def __init__(self, wan_id, wan, vehicle, store):
+class InControl2Wan(InControl2Entity, SensorEntity):
+
+    def __init__(self, coordinator, wan_id, wan, vehicle, store):
+        super().__init__(coordinator, vehicle)
         self._wan_id = wan_id
         self._wan = wan
-        self._vehicle = vehicle
         self._store = store
         self._data = {}
 
         self._vehicle.add_entity(self)
 
-    async def async_update(self) -> bool:
-        await self._vehicle.update()
-
-        wan = next((wan for wan in self._vehicle.wans if wan.get(
-            'id') == self._wan_id), None)
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        wan = self._vehicle.get_wan(self._wan_id)
 
         if wan is None:
             _LOGGER.debug(f"WAN id {self._wan_id} not found in update")
-            return False
+        else:
+            self._wan = wan
 
-        self._wan = wan
+        super()._handle_coordinator_update()
+
+    def _inputs_changed(self) -> bool:
+        # The WAN and the device name and status, not the device's counters
+        return self._vehicle.has_changed(CHANGED_STATUS, ('wan', self._wan_id))
 
-        return True
+    @property
+    def wan_id(self) -> int:
+        return self._wan_id
 
     @property
     def name(self):
@@ -66,22 +97,22 @@ class InControl2Wan(SensorEntity):
 
     @property
     def wan_name(self):
-        return self._wan.get('name')
+        return self._wan.name
 
     @property
     def state(self):
         """Return the state of the sensor."""
 
-        return self._wan.get("signal")
+        return self._wan.signal
 
     @property
     def icon(self):
-        signal_bars = self._wan.get("signal_bar", 0)
+        signal_bars = self._wan.signal_bar or 0
 
-        if self._wan.get("virtualType") == "cellular" and signal_bars <= 6:
+        if self._wan.virtual_type == "cellular" and signal_bars <= 6:
             return IncontrolIcons.CELLULAR_STRENGTH[signal_bars]
 
-        if self._wan.get("virtualType") == "wifi" and signal_bars <= 6:
+        if self._wan.virtual_type == "wifi" and signal_bars <= 6:
             return IncontrolIcons.WIFI_STRENGTH[signal_bars]
 
         return IncontrolIcons.SIGNAL_DEFAULT
@@ -101,10 +132,10 @@ class InControl2Wan(SensorEntity):
                 # Serial numbers are unique identifiers within a specific domain
                 (DOMAIN, self.device_id)
             },
-            "name": self._vehicle.data.get("name"),
+            "name": self._vehicle.data.name,
             "manufacturer": PEPLINK,
-            "model": self._vehicle.data.get("product_name"),
-            "sw_version": self._vehicle.data.get("fw_ver "),
+            "model": self._vehicle.data.product_name,
+            "sw_version": self._vehicle.data.firmware,
         }
 
     @property
@@ -112,13 +143,107 @@ class InControl2Wan(SensorEntity):
         return SensorDeviceClass.SIGNAL_STRENGTH
 
     @property
-    def suggested_unit_of_measurement(self):
+    def native_unit_of_measurement(self):
         return SIGNAL_UNITS
 
     @property
-    def unit_of_measurement(self):
-        return SIGNAL_UNITS
+    def entity_registry_enabled_default(self) -> bool:
+        return self._wan.is_enable == 1
+
+
+class InControl2ApiSensor(CoordinatorEntity, SensorEntity):
+    """Diagnostic sensor about the InControl2 API connection."""
+
+    def __init__(self, coordinator: InControl2Coordinator, entry_id: str):
+        super().__init__(coordinator)
+        self._entry_id = entry_id
 
     @property
-    def entity_registry_enabled_default(self) -> bool:
-        return self._wan.get("is_enable", 0) == 1
+    def entity_category(self):
+        return EntityCategory.DIAGNOSTIC
+
+    @property
+    def device_info(self):
+        return {
+            "identifiers": {
+                (DOMAIN, self._entry_id)
+            },
+            "name": "InControl2 API",
+            "manufacturer": PEPLINK,
+            "entry_type": DeviceEntryType.SERVICE,
+        }
+
+
+class InControl2ApiRequests(InControl2ApiSensor):
+    _unrecorded_attributes = frozenset({'cache', 'retries', 'rate_limiter', 'pool'})
+
+    @property
+    def name(self):
+        return 'InControl2 API Requests'
+
+    @property
+    def unique_id(self):
+        return f'{self._entry_id}_api_requests'
+
+    @property
+    def icon(self):
+        return 'mdi:api'
+
+    @property
+    def state_class(self):
+        return SensorStateClass.TOTAL_INCREASING
+
+    @property
+    def native_value(self):
+        return self.coordinator.connection.request_count
+
+    @property
+    def extra_state_attributes(self):
+        connection = self.coordinator.connection
+        return {
+            'cache': connection.cache.stats,
+            'retries': connection.retry_policy.stats,
+            'rate_limiter': connection.rate_limiter.stats,
+            'pool': connection.pool_stats,
+        }
+
+
+class InControl2ApiLatency(InControl2ApiSensor):
+    _unrecorded_attributes = frozenset({'requests', 'cache_hits', 'statuses', 'bytes', 'retries', 'timeouts',
+                                        'errors', 'latency_max', 'histogram'})
+
+    def __init__(self, coordinator: InControl2Coordinator, entry_id: str, name: str, template: str):
+        super().__init__(coordinator, entry_id)
+        self._name = name
+        self._template = template
+
+    @property
+    def name(self):
+        return f'InControl2 API {self._name} Latency'
+
+    @property
+    def unique_id(self):
+        return f'{self._entry_id}_api_latency_{self._template}'
+
+    @property
+    def device_class(self):
+        return SensorDeviceClass.DURATION
+
+    @property
+    def state_class(self):
+        return SensorStateClass.MEASUREMENT
+
+    @property
+    def native_unit_of_measurement(self):
+        return UnitOfTime.MILLISECONDS
+
+    @property
+    def native_value(self):
+        latency = self.coordinator.connection.metrics.endpoint(self._template).latency_mean
+        return round(latency * 1000, 1) if latency is not None else None
+
+    @property
+    def extra_state_attributes(self):
+        attributes = self.coordinator.connection.metrics.endpoint(self._template).as_dict()
+        del attributes['latency_mean']
+        return attributes
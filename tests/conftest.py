@@ -0,0 +1,58 @@
+"""Fixtures for InControl2 tests."""
+import argparse
+import time
+from functools import partial
+from unittest.mock import patch
+
+import pytest
+from aiohttp import web
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from benchmarks.bench_fleet import MockInControl2
+from custom_components.incontrol2 import incontrol2
+from custom_components.incontrol2.const import CONF_CLIENT_ID, CONF_CLIENT_SECRET, DOMAIN, STORAGE_KEY
+
+CLIENT_ID = "client-12345"
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    yield
+
+
+@pytest.fixture
+async def mock_api(socket_enabled):
+    """Serve a small fleet on localhost and point new connections at it."""
+    args = argparse.Namespace(orgs=1, groups=2, devices=3, wans=2, loc_points=2, padding=0, embed_interfaces=False,
+                              offline_rate=0, latency=0, error_rate=0, seed=1)
+    mock = MockInControl2(args)
+    runner = web.AppRunner(mock.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+
+    endpoint = f'http://127.0.0.1:{runner.addresses[0][1]}/rest/'
+    with patch.object(incontrol2, 'InControl2Connection',
+                      partial(incontrol2.InControl2Connection, api_endpoint=endpoint)):
+        yield mock
+
+    await runner.cleanup()
+
+
+@pytest.fixture
+def config_entry(hass, hass_storage):
+    """Add a config entry whose account already holds a valid token."""
+    key = f"{STORAGE_KEY}_{CLIENT_ID[-5:]}"
+    hass_storage[key] = {
+        "version": 1,
+        "minor_version": 1,
+        "key": key,
+        "data": {"access_token": "token", "refresh_token": "refresh", "expires_in": 86400 * 365,
+                 "expires_at": int(time.time()) + 86400 * 365},
+    }
+    entry = MockConfigEntry(domain=DOMAIN, unique_id=f"InControl2-{CLIENT_ID[-5:]}",
+                            data={CONF_CLIENT_ID: CLIENT_ID, CONF_CLIENT_SECRET: "secret",
+                                  "callback_url": "http://localhost/api/incontrol2"})
+    entry.add_to_hass(hass)
+
+    return entry
@@ -0,0 +1,81 @@
+"""Tests for the InControl2 config flow."""
+from unittest.mock import patch
+
+import pytest
+from homeassistant.config_entries import SOURCE_REAUTH, SOURCE_USER
+from homeassistant.core import HomeAssistant
+from homeassistant.data_entry_flow import FlowResultType
+from homeassistant.setup import async_setup_component
+
+from custom_components.incontrol2.const import AUTH_CALLBACK_PATH, CONF_CLIENT_ID, CONF_CLIENT_SECRET, DOMAIN
+from custom_components.incontrol2.incontrol2 import InControl2OAuth
+
+from .conftest import CLIENT_ID
+
+
+@pytest.fixture
+async def http(hass: HomeAssistant, socket_enabled) -> None:
+    """Serve the callback view on the URL the authorize links point to."""
+    assert await async_setup_component(hass, "http", {})
+    hass.config.internal_url = "http://example.local:8123"
+
+
+async def test_user(hass: HomeAssistant, http, hass_client_no_auth) -> None:
+    """The callback view passes the authorization code on to the flow that sent the user."""
+    result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": SOURCE_USER})
+    assert result["type"] is FlowResultType.FORM
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {CONF_CLIENT_ID: CLIENT_ID, CONF_CLIENT_SECRET: "secret"})
+    assert result["type"] is FlowResultType.EXTERNAL_STEP
+    assert result["step_id"] == "auth"
+    assert f"state={result['flow_id']}" in result["url"]
+
+    client = await hass_client_no_auth()
+    response = await client.get(AUTH_CALLBACK_PATH, params={"code": "code", "state": result["flow_id"]})
+    assert response.status == 200
+
+    with patch.object(InControl2OAuth, "get_access_token", return_value={}) as get_access_token:
+        result = await hass.config_entries.flow.async_configure(result["flow_id"])
+
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert result["result"].unique_id == f"InControl2-{CLIENT_ID[-5:]}"
+    assert result["data"][CONF_CLIENT_ID] == CLIENT_ID
+    get_access_token.assert_awaited_once_with("code")
+
+
+async def test_reauth(hass: HomeAssistant, http, config_entry, hass_client_no_auth) -> None:
+    """Reauthenticating keeps the entry's client and stores the new authorization."""
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": SOURCE_REAUTH, "entry_id": config_entry.entry_id}, data=config_entry.data)
+    assert result["type"] is FlowResultType.EXTERNAL_STEP
+    assert result["step_id"] == "reauth_confirm"
+
+    client = await hass_client_no_auth()
+    response = await client.get(AUTH_CALLBACK_PATH, params={"code": "new-code", "state": result["flow_id"]})
+    assert response.status == 200
+
+    with patch.object(InControl2OAuth, "get_access_token", return_value={}) as get_access_token:
+        result = await hass.config_entries.flow.async_configure(result["flow_id"])
+
+    assert result["type"] is FlowResultType.ABORT
+    assert result["reason"] == "reauth_successful"
+    get_access_token.assert_awaited_once_with("new-code")
+    assert config_entry.data[CONF_CLIENT_ID] == CLIENT_ID
+
+
+async def test_callback_rejects_unknown_state(hass: HomeAssistant, http, hass_client_no_auth) -> None:
+    """Codes are only accepted for a flow waiting for one."""
+    result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": SOURCE_USER})
+    authorizing = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {CONF_CLIENT_ID: CLIENT_ID, CONF_CLIENT_SECRET: "secret"})
+    waiting = await hass.config_entries.flow.async_init(DOMAIN, context={"source": SOURCE_USER})
+    client = await hass_client_no_auth()
+
+    for state in ("unknown", waiting["flow_id"]):
+        response = await client.get(AUTH_CALLBACK_PATH, params={"code": "code", "state": state})
+        assert response.status == 400
+
+    # Neither flow moved on
+    assert hass.config_entries.flow.async_get(waiting["flow_id"])["step_id"] == "user"
+    assert hass.config_entries.flow.async_get(authorizing["flow_id"])["step_id"] == "auth"
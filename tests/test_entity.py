@@ -0,0 +1,41 @@
+"""Tests for the InControl2 entities."""
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.incontrol2.const import DOMAIN
+from custom_components.incontrol2.incontrol2 import InControl2Device
+
+
+async def refresh_all(hass: HomeAssistant, coordinator) -> None:
+    InControl2Device.schedule_all_now(coordinator.connection)
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+
+async def test_counters_only_update_the_status_sensor(hass: HomeAssistant, mock_api, config_entry) -> None:
+    """A poll that only changes a router's counters leaves its WAN and location entities alone."""
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    registry = er.async_get(hass)
+    entity_ids = {
+        'status': registry.async_get_entity_id('binary_sensor', DOMAIN, 'org0_0_0'),
+        'wan_status': registry.async_get_entity_id('binary_sensor', DOMAIN, 'org0_0_0_wan_status_1'),
+        'wan_signal': registry.async_get_entity_id('sensor', DOMAIN, 'org0_0_0_wan_1'),
+        'location': registry.async_get_entity_id('device_tracker', DOMAIN, 'org0_0_0'),
+    }
+    coordinator = config_entry.runtime_data
+
+    # No new location fixes, so only the uptime changes between polls
+    mock_api.args.loc_points = 0
+    await refresh_all(hass, coordinator)
+    reported = {name: hass.states.get(entity_id).last_reported for name, entity_id in entity_ids.items()}
+
+    await refresh_all(hass, coordinator)
+
+    written = {name for name, entity_id in entity_ids.items()
+               if hass.states.get(entity_id).last_reported != reported[name]}
+    assert written == {'status'}
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
@@ -0,0 +1,198 @@
+"""Tests for setting up and unloading InControl2 config entries."""
+import asyncio
+import gc
+import logging
+import tracemalloc
+from datetime import timedelta
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr, entity_registry as er, storage
+from homeassistant.helpers.entity_platform import DATA_ENTITY_PLATFORM
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from custom_components.incontrol2.const import DOMAIN, SNAPSHOT_SAVE_DELAY, SNAPSHOT_STORAGE_KEY
+from custom_components.incontrol2.incontrol2 import InControl2Device
+
+WARMUP_RELOADS = 5
+RELOADS = 20
+# Traced memory may grow this much over all reloads, e.g. for interned strings, caches and timers
+# cancelled but not yet purged from the event loop
+MAX_MEMORY_GROWTH = 64 * 1024
+
+
+def forget_unloaded_state(hass: HomeAssistant) -> None:
+    """Drop what the harness and Home Assistant itself keep of unloaded entries."""
+    # The storage mocks record every call, holding on to each Store and the data it wrote
+    storage.Store._async_load.reset_mock()
+    storage.Store._async_write_data.reset_mock()
+    storage.Store.async_remove.reset_mock()
+    # Unloading a config entry resets its entity platforms but never unregisters them
+    platforms = hass.data[DATA_ENTITY_PLATFORM][DOMAIN]
+    platforms[:] = [platform for platform in platforms if platform.entities]
+
+
+def traced_memory() -> int:
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    return current
+
+
+def pending_timers(hass: HomeAssistant) -> int:
+    return sum(1 for handle in hass.loop._scheduled if not handle.cancelled())
+
+
+async def test_setup_and_unload(hass: HomeAssistant, mock_api, config_entry) -> None:
+    """Unloading an entry drops its devices and closes its connection."""
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    coordinator = config_entry.runtime_data
+    connection = coordinator.connection
+    assert config_entry.state is ConfigEntryState.LOADED
+    assert len(connection.devices) == 6
+    assert er.async_entries_for_config_entry(er.async_get(hass), config_entry.entry_id)
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert config_entry.state is ConfigEntryState.NOT_LOADED
+    assert connection.closed
+    assert connection.devices == []
+    assert connection.orgs == []
+    assert hass.states.async_entity_ids(DOMAIN) == []
+
+
+async def test_update_service_polls_every_device(hass: HomeAssistant, mock_api, config_entry) -> None:
+    """The update_all service polls devices that adaptive polling has not made due yet."""
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    mock_api.requests.clear()
+
+    await hass.services.async_call(DOMAIN, 'update_all', blocking=True)
+    await hass.async_block_till_done()
+
+    # Every device's location is fetched, though none was due right after setup
+    assert mock_api.requests['o/*/g/*/d/*/loc'] == len(config_entry.runtime_data.connection.devices)
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_empty_wan_listing_keeps_wans(hass: HomeAssistant, mock_api, config_entry) -> None:
+    """A device whose interface listing comes back empty keeps its WAN entities."""
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    registry = er.async_get(hass)
+    entity_ids = {entry.entity_id for entry in er.async_entries_for_config_entry(registry, config_entry.entry_id)}
+    coordinator = config_entry.runtime_data
+
+    mock_api.args.wans = 0
+    InControl2Device.schedule_all_now(coordinator.connection)
+    await coordinator.async_refresh()
+    await hass.services.async_call(DOMAIN, 'discover_devices', blocking=True)
+    await hass.async_block_till_done()
+
+    assert all(len(device.wans) == 2 for device in coordinator.connection.devices)
+    remaining = {entry.entity_id for entry in er.async_entries_for_config_entry(registry, config_entry.entry_id)}
+    assert remaining == entity_ids
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_discovery_removes_devices(hass: HomeAssistant, mock_api, config_entry) -> None:
+    """Routers missing from a discovery lose their entities and their device registry entries."""
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    device_registry = dr.async_get(hass)
+    removed = [(DOMAIN, 'org0_0_2'), (DOMAIN, 'org0_1_100002')]
+    assert all(device_registry.async_get_device(identifiers={identifier}) for identifier in removed)
+
+    mock_api.args.devices = 2
+    await hass.services.async_call(DOMAIN, 'discover_devices', blocking=True)
+    await hass.async_block_till_done()
+
+    assert len(config_entry.runtime_data.connection.devices) == 4
+    assert not any(device_registry.async_get_device(identifiers={identifier}) for identifier in removed)
+    assert not any(entry.unique_id.startswith(('org0_0_2', 'org0_1_100002'))
+                   for entry in er.async_entries_for_config_entry(er.async_get(hass), config_entry.entry_id))
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_snapshot_saved_on_changes(hass: HomeAssistant, hass_storage, mock_api, config_entry) -> None:
+    """Polls that only change the counters do not save the snapshot again; new location fixes do."""
+    key = f"{SNAPSHOT_STORAGE_KEY}.{config_entry.entry_id}"
+    mock_api.args.loc_points = 0
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = config_entry.runtime_data
+
+    async def poll_and_wait(delays: int) -> None:
+        InControl2Device.schedule_all_now(coordinator.connection)
+        await coordinator.async_refresh()
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=delays * (SNAPSHOT_SAVE_DELAY + 1)))
+        await hass.async_block_till_done()
+
+    # Discovery saved the snapshot at setup
+    await poll_and_wait(1)
+    assert hass_storage.pop(key)['data']['orgs']
+
+    await poll_and_wait(2)
+    assert key not in hass_storage
+
+    mock_api.args.loc_points = 2
+    await poll_and_wait(3)
+    assert key in hass_storage
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_reload_does_not_leak(hass: HomeAssistant, mock_api, config_entry, caplog) -> None:
+    """Reloading an entry many times keeps memory, requests, tasks and timers flat."""
+    # Captured log records would grow with every reload
+    caplog.set_level(logging.WARNING)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    async def reload() -> int:
+        mock_api.requests.clear()
+        assert await hass.config_entries.async_reload(config_entry.entry_id)
+        await hass.async_block_till_done()
+        assert config_entry.state is ConfigEntryState.LOADED
+        forget_unloaded_state(hass)
+        return sum(mock_api.requests.values())
+
+    # Measure outside debug mode, where every handle keeps the traceback it was created at
+    debug = hass.loop.get_debug()
+    hass.loop.set_debug(False)
+    tracemalloc.start()
+    try:
+        # Reloads restore from the snapshot saved on unload, and replace what the initial setup
+        # allocated before tracing started
+        for _ in range(WARMUP_RELOADS):
+            expected_requests = await reload()
+        tasks = len(asyncio.all_tasks())
+        timers = pending_timers(hass)
+        baseline = traced_memory()
+
+        requests = [await reload() for _ in range(RELOADS)]
+        current = traced_memory()
+    finally:
+        tracemalloc.stop()
+        hass.loop.set_debug(debug)
+
+    assert requests == [expected_requests] * RELOADS
+    assert current - baseline < MAX_MEMORY_GROWTH
+    assert len(asyncio.all_tasks()) == tasks
+    assert pending_timers(hass) == timers
+    assert len(config_entry.runtime_data.connection.devices) == 6
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
@@ -0,0 +1,52 @@
+"""Tests for the streaming JSON parsers of the InControl2 API client."""
+import json
+
+import pytest
+
+from custom_components.incontrol2 import incontrol2
+
+BODIES = [
+    {"stat": "ok", "total": 12.5, "data": [{"id": 1}, {"id": 2}]},
+    {"stat": "ok", "data": [12.5, -3, 1e-07, -0.25e+3, 0, 100, True, False, None, "x", [], {}]},
+    {"data": [{"name": "Zürich ✓ 😀", "nested": {"list": [1, [2, [3]]], "escaped": "a\"b\\c"}}], "after": -1.5},
+    {"stat": "ok", "data": []},
+    {"stat": "ok", "data": [{"la": 45.0001, "lo": -122.0, "at": 10, "sp": 30, "ts": "000000000001"}] * 5},
+]
+CHUNK_SIZES = range(1, 17)
+
+
+def dumps(body: dict, separators: tuple = None) -> bytes:
+    return json.dumps(body, ensure_ascii=False, separators=separators).encode()
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("separators", [None, (',', ':')])
+def test_iter_json_array(monkeypatch, chunk_size: int, separators: tuple) -> None:
+    """The elements match json.loads wherever the chunk boundaries fall."""
+    monkeypatch.setattr(incontrol2, "STREAM_CHUNK_SIZE", chunk_size)
+
+    for body in BODIES:
+        encoded = dumps(body, separators)
+        assert list(incontrol2.iter_json_array(encoded)) == json.loads(encoded)["data"]
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_parse_array_parsers(monkeypatch, chunk_size: int) -> None:
+    """The parsers built on iter_json_array match filtering the output of json.loads."""
+    monkeypatch.setattr(incontrol2, "STREAM_CHUNK_SIZE", chunk_size)
+    body = {"stat": "ok", "total": 3, "data": [{"id": index, "signal": -80.5 - index, "note": "x" * index}
+                                               for index in range(6)]}
+    encoded = dumps(body)
+
+    assert incontrol2.parse_array_tail(2)(encoded) == {"data": body["data"][-2:]}
+    assert incontrol2.parse_array_tail(2, lambda item: item["id"] % 2)(encoded) == \
+        {"data": [body["data"][3], body["data"][5]]}
+    assert incontrol2.parse_array_fields(("id", "signal"))(encoded) == \
+        {"data": [{"id": item["id"], "signal": item["signal"]} for item in body["data"]]}
+
+
+def test_iter_json_array_without_array() -> None:
+    """Bodies without the array yield nothing."""
+    assert list(incontrol2.iter_json_array(b'{"stat": "error", "total": 1.5}')) == []
+    assert list(incontrol2.iter_json_array(b'[1, 2]')) == []
+    assert list(incontrol2.iter_json_array(b'')) == []